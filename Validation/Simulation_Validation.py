@@ -13,21 +13,48 @@ from py_wake.site._site import LocalWind
 import numpy as np
 import matplotlib.pyplot as plt
 
+from data_quality import (nan_filter, range_filter, stuck_filter, curtailment_filter, status_filter,
+                          run_filters)
+from energy_aggregation import aggregate, summarize
+from power_curves import SENVION_CT, SENVION_DIAMETER, SENVION_POWER, SENVION_WS, load_power_curve
+
 # %% read in real turbine data
 turbine_data_raw = pd.read_csv('Kelmarsh_SCADA_2021_3087/Turbine_Data_Kelmarsh_1_2021-01-01_-_2021-07-01_228.csv', skiprows=9)
-turbine_data = turbine_data_raw[['# Date and time', 'Wind speed (m/s)', 'Power (kW)']].dropna()
 
 # %% Define turbine power curve
-wind_speed = np.array([3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24])
-ct = np.array([0.98, 0.87, 0.79, 0.79, 0.79, 0.79, 0.74, 0.69, 0.54, 0.39, 0.29, 0.23, 0.19, 
-               0.15, 0.13, 0.11, 0.09, 0.08, 0.07, 0.06, 0.06, 0.05])
-power = np.array([20.0, 94.0, 205.0, 391.0, 645.0, 979.0, 1375.0, 1795.0, 2000.0, 2040.0,
-                  2050.0, 2050.0, 2050.0, 2050.0, 2050.0, 2050.0, 2050.0, 2050.0, 2050.0,
-                  2050.0, 2050.0, 2050.0])  # Power in kW
-
-turbine = WindTurbine(name='Senvion MM92', diameter=92.5, hub_height=100, 
+# 'manufacturer' uses the Senvion MM92 datasheet curve. 'scada' fits this turbine's own
+# curve from its SCADA over fit_window (cached after the first run); pick a window that
+# does not overlap the period being validated to keep the comparison out of sample
+curve_source = 'manufacturer'
+fit_window = ('2021-01-01', '2021-04-01')
+if curve_source == 'scada':
+    curve = load_power_curve('Kelmarsh_SCADA_2021_3087/Turbine_Data_Kelmarsh_1_2021-01-01_-_2021-07-01_228.csv',
+                             'Kelmarsh_SCADA_2021_3087/Status_Kelmarsh_1_2021-01-01_-_2021-07-01_228.csv',
+                             *fit_window, curtailment_curve=(SENVION_WS, SENVION_POWER))
+    wind_speed, power, ct = curve['ws'].to_numpy(), curve['power_kw'].to_numpy(), curve['ct'].to_numpy()
+    print(f"Fitted power curve from {curve['count'].sum()} records in {len(curve)} bins")
+else:
+    wind_speed, power, ct = SENVION_WS, SENVION_POWER.astype(float), SENVION_CT
+
+turbine = WindTurbine(name='Senvion MM92', diameter=SENVION_DIAMETER, hub_height=100,
                       powerCtFunction=PowerCtTabular(wind_speed, power, 'kW', ct))
 
+# %% Data quality filtering
+# Missing values, stops, icing, curtailment and bad sensor readings are dropped before
+# comparing against the power curve; the report counts the rows each filter removed
+columns = ['# Date and time', 'Wind speed (m/s)', 'Power (kW)']
+measured_data = turbine_data_raw[columns]
+keep, quality_report = run_filters(measured_data, [
+    ('missing values', nan_filter(columns)),
+    ('status', status_filter('Kelmarsh_SCADA_2021_3087/Status_Kelmarsh_1_2021-01-01_-_2021-07-01_228.csv',
+                             time_column='# Date and time')),
+    ('wind speed range', range_filter('Wind speed (m/s)', 0, 40)),
+    ('stuck wind speed', stuck_filter('Wind speed (m/s)')),
+    ('curtailment', curtailment_filter('Wind speed (m/s)', 'Power (kW)', wind_speed, power)),
+])
+print(quality_report)
+turbine_data = measured_data[keep].copy()
+
 # %% Predict power for real wind speed data
 # Interpolate power from the power curve
 turbine_data['Predicted Power (kW)'] = np.interp(
@@ -44,13 +71,14 @@ print(f"Mean Error: {mean_error:.2f} kW")
 print(f"Mean Absolute Error: {mean_absolute_error:.2f} kW")
 
 # %% AEP Extrapolation from Real Data
-time_step_hours = 10 / 60  # Assuming 10-minute intervals
-turbine_data['Energy (kWh)'] = turbine_data['Power (kW)'] * time_step_hours
-total_energy_kwh = turbine_data['Energy (kWh)'].sum()
-
-n_days = (pd.to_datetime(turbine_data.iloc[-1]['# Date and time']) -
-          pd.to_datetime(turbine_data.iloc[0]['# Date and time'])).days
-aep_real = total_energy_kwh * (365 / n_days) / 1e6  # Convert to GWh
+# Streams the raw file in chunks and uses every measured row, including stops, since
+# those are part of the real production. Gaps in the data are excluded from the
+# hours used to scale the measured energy to a full year
+energy_summary = summarize(aggregate([(1, 'Kelmarsh_SCADA_2021_3087/Turbine_Data_Kelmarsh_1_2021-01-01_-_2021-07-01_228.csv',
+                                       'Kelmarsh_SCADA_2021_3087/Status_Kelmarsh_1_2021-01-01_-_2021-07-01_228.csv')],
+                                     workers=1), rated_power_kw=2050)
+print(energy_summary)
+aep_real = energy_summary['aep_gwh'].iloc[0]
 print(f"AEP from Real Data: {aep_real:.2f} GWh")
 
 # %% Calculate AEP from Power Curve
@@ -1,119 +1,154 @@
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
-from pyproj import Proj
 from py_wake.literature.noj import Jensen_1983
-from py_wake.wind_turbines import WindTurbine
-from py_wake.wind_turbines.power_ct_functions import PowerCtTabular
-from py_wake.site import UniformSite
 from py_wake.wind_farm_models.engineering_models import All2AllIterative
-import glob
-
-# %% Step 1: Hardcoded Turbine Locations and Hub Heights
-# Replace KML parsing with hardcoded values
-# Format: (longitude, latitude, hub_height)
-turbine_locations = [
-    (-0.947133, 52.400604, 78.5),
-    (-0.949527, 52.402551, 78.5),
-    (-0.94419, 52.403834, 68.5),
-    (-0.94115, 52.398781, 78.5),
-    (-0.940537, 52.402308, 78.5),
-    (-0.936093, 52.400687, 68.5)
-]
-
-# Convert Latitude/Longitude to Cartesian Coordinates
-utm_projection = Proj(proj="utm", zone=33, datum="WGS84")  # Adjust UTM zone if needed
-x, y, hub_heights = [], [], []
-
-for lon, lat, hub_height in turbine_locations:
-    utm_x, utm_y = utm_projection(lon, lat)
-    x.append(utm_x)
-    y.append(utm_y)
-    hub_heights.append(hub_height)
+
+from results_store import ResultsStore
+from timeseries_simulator import simulate_chunk, simulate_stream, iter_inflow_frame
+from condition_binning import bin_series, binning_error, solve_bins
+from wind_resource import load_site
+from data_quality import availability
+from model_comparison import TURBINE_LOCATIONS, load_farm_data
+from power_curves import SENVION_DIAMETER, SENVION_POWER, SENVION_WS, fitted_turbines, senvion_turbine
+
+# %% Step 1: Load and Clean the SCADA Data
+# The same loader as model_comparison.py and benchmarks/validation_benchmark.py, so all three
+# validate against identical data. Rejection masks are built on whole columns before simulating,
+# so rejected rows never reach the solver. A turbine that is stopped, iced or not communicating
+# does not reject the row; it is left out of the wake solve instead, and rows where no turbine
+# is available are dropped. Turbine positions are projected to UTM (zone 33)
+arrays, timestamps, file_list, status_files = load_farm_data('Kelmarsh_SCADA_2021_3087')
+turbine_locations = TURBINE_LOCATIONS
+x, y, hub_heights = arrays['x'], arrays['y'], arrays['h']
+print(f"Kept {len(timestamps)} timestamps")
 
 print("Turbine Locations (Cartesian):")
 for i, (utm_x, utm_y, hub_height) in enumerate(zip(x, y, hub_heights)):
     print(f"Turbine {i+1}: x={utm_x}, y={utm_y}, hub_height={hub_height}")
 
-# Define turbine layout
-turbine_layout = {f"Turbine_{i+1}": (utm_x, utm_y) for i, (utm_x, utm_y) in enumerate(zip(x, y))}
-
-# %% Step 2: Read Time-Series Data for Each Turbine
-file_pattern = "Kelmarsh_SCADA_2021_3087/Turbine_Data_Kelmarsh_*_2021-01-01_-_2021-07-01_*.csv"  # Replace with your file naming pattern
-file_list = glob.glob(file_pattern)
-
-turbine_data = {}
-for i, file in enumerate(file_list, start=1):
-    turbine_name = f"Turbine_{i}"
-    try:
-        data = pd.read_csv(file, skiprows=9)
-        if {'Wind speed (m/s)', 'Wind direction (°)', 'Power (kW)'} <= set(data.columns):
-            turbine_data[turbine_name] = data
-        else:
-            raise ValueError(f"Missing required columns in {file}")
-    except Exception as e:
-        print(f"Error reading {file}: {e}")
-
-# %% Combine Wind Speed and Power Data
-data_combined = pd.concat({k: v[['Wind speed (m/s)', 'Wind direction (°)', 'Power (kW)']] for k, v in turbine_data.items()}, axis=1)
-data_combined.columns = [f"{col[0]}_{col[1]}" for col in data_combined.columns]
+# Per-turbine availability of the kept rows, in turbine order
+available = pd.DataFrame(arrays['available'], index=timestamps,
+                         columns=[f"Turbine_{i}" for i in range(1, len(file_list) + 1)])
+print(f"Turbine availability over kept rows:\n{available.mean()}")
 
-# %% Define Turbine Power and Ct Curve
-wind_speeds = np.array([3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24])
-ct = np.array([0.98, 0.87, 0.79, 0.79, 0.79, 0.79, 0.74, 0.69, 0.54, 0.39, 0.29, 0.23, 0.19, 
-               0.15, 0.13, 0.11, 0.09, 0.08, 0.07, 0.06, 0.06, 0.05])
-power = np.array([20, 94, 205, 391, 645, 979, 1375, 1795, 2000, 2040, 2050, 2050, 2050, 2050, 
-                  2050, 2050, 2050, 2050, 2050, 2050, 2050, 2050])  # kW
+# Farm-average inflow and the observed power of the available turbines for the kept rows
+farm_data = pd.DataFrame({'wd': arrays['wd'], 'ws': arrays['ws'], 'observed': arrays['observed']},
+                         index=timestamps)
 
-turbine = WindTurbine(name="Senvion MM92", diameter=92.5, hub_height=None,
-                      powerCtFunction=PowerCtTabular(wind_speeds, power, 'kW', ct))
+# %% Define Turbine Power and Ct Curve
+# 'manufacturer' gives every turbine the Senvion MM92 datasheet curve. 'scada' gives each
+# turbine its own curve fitted from its SCADA over fit_window (cached after the first run),
+# solved as one turbine type per turbine
+curve_source = 'manufacturer'
+fit_window = ('2021-01-01', '2021-04-01')
+
+# Kelmarsh mixes 78.5 m and 68.5 m towers on the same rotor: 78.5 m is the type's default,
+# and every solve passes each turbine's own height as h
+if curve_source == 'scada':
+    turbine = fitted_turbines(file_list, status_files, *fit_window, hub_height=78.5,
+                              curtailment_curve=(SENVION_WS, SENVION_POWER))
+    type_index = np.arange(len(file_list))
+else:
+    turbine = senvion_turbine(hub_height=78.5)
+    type_index = None
 
 # %% Define the Site and Wake Model
-site = UniformSite(p_wd=[1], ti=0.1)  # Uniform wind direction probabilities
+# model_comparison.py scores several wake and superposition models on this same data in parallel
+# Measured wind climate fitted from the SCADA files; cached after the first run
+site = load_site(file_list)
 wake_model = Jensen_1983(site, turbine)
 
+# %% Condition binning
+# Solve each (ws, wd) bin once at the mean inflow of its timestamps instead of every
+# timestamp; set bin_conditions = None to solve every timestamp exactly
+bin_conditions = {'ws_step': 0.5, 'wd_step': 2.0}
+bins_per_checkpoint = 200  # bins solved between checkpoints
+binning_error_samples = 500  # at most this many exact solves check the binning
+binning_error_fraction = 0.02  # ... and at most this fraction of the solved timestamps
+
+# %% Results store keyed by the model configuration
+# Only timestamps without stored results are simulated; changing anything in the
+# configuration starts a fresh store. The curves are stored tabulated, so a refitted
+# curve also starts one
+curve_ws = np.arange(0, 26, 0.5)
+curve_types = [0] if type_index is None else type_index
+model_config = {
+    'wake_model': 'Jensen_1983',
+    'site': site.ds.to_dict(),
+    'turbine': {'name': 'Senvion MM92', 'diameter': SENVION_DIAMETER, 'curve_source': curve_source,
+                'wind_speeds': curve_ws, 'power': [turbine.power(curve_ws, type=t) for t in curve_types],
+                'ct': [turbine.ct(curve_ws, type=t) for t in curve_types]},
+    'turbine_locations': turbine_locations,
+    'prediction': 'sum of available turbine power (kW)',
+    'availability': {'statuses': ['Stop'], 'messages': ['Icing', 'communication']},
+    'binning': bin_conditions,
+}
+results_store = ResultsStore('validation_results', model_config)
+checkpoint_every = 500  # timestamps simulated between checkpoints
+seen_timestamps = results_store.seen()
+print(f"Results store {results_store.key}: {len(seen_timestamps)} timestamps already simulated")
+
 # %% Simulate the Wind Farm and Compare to Real Data
-observed_powers = []
-predicted_powers = []
-
-for i, row in data_combined.iloc[::1].iterrows():  # Skip every 50th row for faster processing
-    # Aggregate wind direction and speed across all turbines for each time step
-    wind_directions = row[[col for col in data_combined.columns if 'Wind direction' in col]].mean()
-    wind_speeds = row[[col for col in data_combined.columns if 'Wind speed' in col]].mean()
-
-    # Skip rows with invalid or missing data
-    if np.isnan(wind_directions) or np.isnan(wind_speeds):
-        continue
-
-    # Ensure wind directions and speeds are arrays matching turbine count
-    wind_directions_array = np.full(len(x), wind_directions)
-    wind_speeds_array = np.full(len(x), wind_speeds)
-
-    # Simulate the farm for the aggregated wind speeds and directions
-    try:
-        simulation_result = wake_model(x=np.array(x), y=np.array(y), h=np.array(hub_heights), wd=wind_directions_array, ws=wind_speeds_array)
-    except Exception as e:
-        print(f"Simulation failed at index {i} with error: {e}")
-        continue
-
-    # Get predicted power for all turbines
-    predicted_power = simulation_result.Power.values.flatten()
-    # print(f"Predicted Power (Raw) Shape: {predicted_power.shape}, Values (Min, Max): {predicted_power.min()}, {predicted_power.max()}")
-    if len(predicted_power) == len(x):
-        if predicted_power.max() > 2050:  # Adjust if scaled to 10-minute intervals
-            predicted_power /= (10 / 60)
-        predicted_powers.append(predicted_power.sum())
-    else:
-        if predicted_power[0] > (2050 * len(x)):
-            predicted_power /= (10 / 60)
-        predicted_powers.append(predicted_power[0]/1000)
-    # Get observed power (sum across turbines for the time step)
-    observed_power = row[[col for col in data_combined.columns if 'Power' in col]].sum()
-    observed_powers.append(observed_power)
+# Unseen timestamps are solved as PyWake time series, one per availability pattern, with
+# stopped turbines left out of the wake solve: in groups of bins, or checkpoint_every timestamps at a time
+unseen = farm_data[~farm_data.index.isin(seen_timestamps)]
+
+if bin_conditions and len(unseen):
+    # All unseen timestamps are binned at once, so each bin collects every timestamp it covers; the
+    # bins are then solved bins_per_checkpoint at a time, storing the results after each group
+    unseen_available = available.loc[unseen.index].to_numpy()
+    bin_index, bin_centres, bin_available = bin_series(unseen['ws'], unseen['wd'], available=unseen_available,
+                                                       **bin_conditions)
+    n_bins = len(bin_centres['ws'])
+    print(f"Condition binning: {n_bins} solves for {len(unseen)} timestamps ({len(unseen) - n_bins} saved)")
+    predicted_total = np.full(len(unseen), np.nan)
+    for start in range(0, n_bins, bins_per_checkpoint):
+        bins = np.arange(start, min(start + bins_per_checkpoint, n_bins))
+        try:
+            positions, turbine_power = solve_bins(wake_model, x, y, hub_heights, bin_index, bin_centres, bins,
+                                                  bin_available, type_index=type_index)
+        except Exception as e:
+            print(f"Simulation failed for bins {bins[0]} - {bins[-1]} with error: {e}")
+            continue
+        predicted_total[positions] = turbine_power.sum(axis=1)
+        chunk = unseen.iloc[positions]
+        results_store.append(list(zip(chunk.index, chunk['observed'], predicted_total[positions])))
+        print(f"{start + len(bins)} of {n_bins} bins simulated")
+
+    # Check the binning against exact solves of a small sample of the solved timestamps
+    solved = np.flatnonzero(~np.isnan(predicted_total))
+    if len(solved):
+        try:
+            binning_report = binning_error(wake_model, x, y, hub_heights, unseen['wd'].to_numpy()[solved],
+                                           unseen['ws'].to_numpy()[solved], predicted_total[solved],
+                                           available=unseen_available[solved],
+                                           error_samples=min(binning_error_samples,
+                                                             max(1, int(binning_error_fraction * len(solved)))),
+                                           type_index=type_index)
+            print(f"Binned farm power error on a sample: MAE {binning_report['mae_kw']:.1f} kW, "
+                  f"max {binning_report['max_error_kw']:.1f} kW "
+                  f"({100 * binning_report['relative_error']:.2f}% of mean)")
+        except Exception as e:
+            print(f"Binning error check failed with error: {e}")
+else:
+    for start in range(0, len(unseen), checkpoint_every):
+        chunk = unseen.iloc[start:start + checkpoint_every]
+        try:
+            turbine_power = simulate_chunk(wake_model, x, y, hub_heights, chunk['wd'], chunk['ws'],
+                                           available.loc[chunk.index].to_numpy(), type_index=type_index)
+        except Exception as e:
+            print(f"Simulation failed for timestamps {chunk.index[0]} - {chunk.index[-1]} with error: {e}")
+            continue
+        # Sum over turbines for the farm total in kW
+        results_store.append(list(zip(chunk.index, chunk['observed'], turbine_power.sum(axis=1))))
+        print(f"{start + len(chunk)} of {len(unseen)} new timestamps simulated")
 
 # %% Calculate Error Metrics
-observed_powers = np.array(observed_powers, dtype=float)
-predicted_powers = np.array(predicted_powers, dtype=float)
+results = results_store.load()
+results = results[results.index.isin(farm_data.index)]
+observed_powers = results['observed'].to_numpy(dtype=float)
+predicted_powers = results['predicted'].to_numpy(dtype=float)
 
 mean_absolute_error = np.mean(np.abs(observed_powers - predicted_powers))
 rmse = np.sqrt(np.mean((observed_powers - predicted_powers) ** 2))
@@ -130,3 +165,11 @@ plt.title("Observed vs Predicted Power")
 plt.legend()
 plt.grid()
 plt.show()
+
+# %% Stream Per-Turbine Power for the Full Series to Disk
+# Columnar output that downstream tools can memory-map with timeseries_simulator.open_columns.
+# Off by default since it solves the whole series again
+stream_turbine_power = False
+if stream_turbine_power:
+    simulate_stream(wake_model, x, y, hub_heights, iter_inflow_frame(farm_data), 'validation_results/timeseries',
+                    available=availability(status_files), type_index=type_index)
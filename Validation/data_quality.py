@@ -0,0 +1,169 @@
+'''
+Simul8ors
+
+Data-quality stage for the SCADA validations. Each filter takes the whole data frame
+and returns a boolean array marking the rows it rejects. Filters are composed with
+run_filters, which reports how many rows each one flagged and how many it removed
+on top of the filters before it. Filter before simulating, so rejected rows never
+reach the solver.
+'''
+
+import numpy as np
+import pandas as pd
+
+TIME_STEP = pd.Timedelta(minutes=10)
+
+
+def _as_list(columns):
+    return [columns] if isinstance(columns, str) else list(columns)
+
+
+def nan_filter(columns):
+    """Reject rows with a missing value in any of the columns."""
+    columns = _as_list(columns)
+
+    def mask(frame):
+        return frame[columns].isna().to_numpy().any(axis=1)
+    return mask
+
+
+def range_filter(columns, low, high):
+    """Reject rows where any of the columns is outside [low, high]."""
+    columns = _as_list(columns)
+
+    def mask(frame):
+        values = frame[columns].to_numpy(dtype=float)
+        with np.errstate(invalid='ignore'):
+            return ((values < low) | (values > high)).any(axis=1)
+    return mask
+
+
+def stuck_mask(values, min_repeats):
+    """True where a value is part of a run of at least min_repeats identical values."""
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return np.zeros(0, dtype=bool)
+    same = np.r_[False, values[1:] == values[:-1]]
+    run_id = np.cumsum(~same)
+    run_length = np.bincount(run_id)
+    return run_length[run_id] >= min_repeats
+
+
+def stuck_filter(columns, min_repeats=6):
+    """Reject rows where a sensor reports the same value min_repeats records in a row."""
+    columns = _as_list(columns)
+
+    def mask(frame):
+        rejected = np.zeros(len(frame), dtype=bool)
+        for column in columns:
+            rejected |= stuck_mask(frame[column].to_numpy(), min_repeats)
+        return rejected
+    return mask
+
+
+def curtailment_filter(speed_columns, power_columns, curve_ws, curve_power, fraction=0.5, min_expected=100.0,
+                       available=None):
+    """Reject rows where measured power is far below the power curve while the wind is producing.
+
+    Rows whose expected power is under min_expected (kW) are never flagged, so
+    scatter around cut-in is left alone. available is an availability(...) function
+    with one status log per power column; turbines that are stopped are not checked.
+    """
+    speed_columns = _as_list(speed_columns)
+    power_columns = _as_list(power_columns)
+
+    def mask(frame):
+        speed = frame[speed_columns].to_numpy(dtype=float)
+        power = frame[power_columns].to_numpy(dtype=float)
+        expected = np.interp(speed, curve_ws, curve_power, left=0.0, right=0.0)
+        with np.errstate(invalid='ignore'):
+            low = (expected >= min_expected) & (power < fraction * expected)
+        if available is not None:
+            low &= available(frame)
+        return low.any(axis=1)
+    return mask
+
+
+def read_status(file):
+    """Read a Kelmarsh Status_*.csv log into start/end timestamps plus the status columns."""
+    status = pd.read_csv(file, skiprows=9)
+    status['start'] = pd.to_datetime(status['Timestamp start'])
+    # Instantaneous events have '-' as their end; treat them as lasting zero time
+    status['end'] = pd.to_datetime(status['Timestamp end'].replace('-', np.nan)).fillna(status['start'])
+    return status
+
+
+def status_intervals(status, statuses=('Stop',), messages=()):
+    """Start/end arrays of the status intervals with a matching Status or Message text."""
+    selected = status['Status'].isin(statuses)
+    for message in messages:
+        selected |= status['Message'].str.contains(message, case=False, na=False)
+    selected &= status['end'] > status['start']
+    return status.loc[selected, 'start'].to_numpy(), status.loc[selected, 'end'].to_numpy()
+
+
+def interval_mask(timestamps, starts, ends, step=TIME_STEP):
+    """True for each record period [t, t + step) that overlaps any [start, end) interval.
+
+    Uses a difference array over the sorted timestamps, so the cost is linear in the
+    number of records plus intervals however much the intervals overlap.
+    """
+    timestamps = np.asarray(pd.to_datetime(timestamps), dtype='datetime64[ns]')
+    order = np.argsort(timestamps, kind='stable')
+    stamps = timestamps[order]
+    step = pd.Timedelta(step).to_timedelta64()
+    first = np.searchsorted(stamps, np.asarray(starts, dtype='datetime64[ns]') - step, side='right')
+    last = np.searchsorted(stamps, np.asarray(ends, dtype='datetime64[ns]'), side='left')
+    counts = np.zeros(len(stamps) + 1, dtype=np.int64)
+    np.add.at(counts, first, 1)
+    np.add.at(counts, last, -1)
+    covered = np.cumsum(counts[:-1]) > 0
+    mask = np.empty_like(covered)
+    mask[order] = covered
+    return mask
+
+
+def status_filter(status_files, statuses=('Stop',), messages=('Icing',), time_column=None):
+    """Reject rows during stops or icing in any of the given Status_*.csv logs.
+
+    time_column names the timestamp column; when None the frame index is used.
+    """
+    intervals = [status_intervals(read_status(file), statuses, messages) for file in _as_list(status_files)]
+
+    def mask(frame):
+        timestamps = frame.index if time_column is None else frame[time_column]
+        rejected = np.zeros(len(frame), dtype=bool)
+        for starts, ends in intervals:
+            rejected |= interval_mask(timestamps, starts, ends)
+        return rejected
+    return mask
+
+
+def availability(status_files, statuses=('Stop',), messages=('Icing', 'communication'), time_column=None):
+    """Per-turbine availability from one Status_*.csv log per turbine.
+
+    Returns a function of the frame giving a (row, turbine) boolean array, False where
+    that turbine's log shows a stop, icing or lost communication during the record.
+    time_column names the timestamp column; when None the frame index is used.
+    """
+    intervals = [status_intervals(read_status(file), statuses, messages) for file in _as_list(status_files)]
+
+    def mask(frame):
+        timestamps = frame.index if time_column is None else frame[time_column]
+        return np.column_stack([~interval_mask(timestamps, starts, ends) for starts, ends in intervals])
+    return mask
+
+
+def run_filters(frame, filters):
+    """Apply (name, filter) pairs in order.
+
+    Returns the boolean array of rows to keep and a report with, per filter, the rows
+    it flagged and the rows it removed that no earlier filter had already removed.
+    """
+    keep = np.ones(len(frame), dtype=bool)
+    report = []
+    for name, mask_function in filters:
+        rejected = np.asarray(mask_function(frame), dtype=bool)
+        report.append((name, int(rejected.sum()), int((keep & rejected).sum())))
+        keep &= ~rejected
+    return keep, pd.DataFrame(report, columns=['filter', 'flagged', 'removed']).set_index('filter')
@@ -0,0 +1,148 @@
+'''
+Simul8ors
+
+Out-of-core energy, AEP and capacity factor aggregation for SCADA power series.
+Data is read in chunks (CSV) or memory-mapped (.npy), and each chunk is reduced to
+per-(turbine, year) partial sums. Partials from any number of chunks, files or worker
+processes merge by summing, so the reduction can run in parallel and never needs a
+whole series in memory.
+
+Gaps are handled by normalising with the hours that actually have data, rather than
+the time between the first and last record.
+'''
+
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_quality import read_status, status_intervals, interval_mask
+
+HOURS_PER_YEAR = 8760
+TIME_STEP_HOURS = 10 / 60
+SUM_COLUMNS = ['energy_kwh', 'valid_hours', 'available_hours', 'available_energy_kwh']
+
+
+def reduce_chunk(turbine, timestamps, power, available=None, time_step_hours=TIME_STEP_HOURS):
+    """Partial sums per (turbine, year) for one chunk of records.
+
+    power is in kW. Records with a missing power value count as a gap. available marks
+    the records where the turbine was available; when None every record is.
+    """
+    timestamps = np.asarray(timestamps, dtype='datetime64[ns]')
+    power = np.asarray(power, dtype=float)
+    valid = ~np.isnan(power)
+    if available is None:
+        available = np.ones(len(power), dtype=bool)
+    available = np.asarray(available, dtype=bool) & valid
+    energy = np.where(valid, power, 0.0) * time_step_hours
+    chunk = pd.DataFrame({
+        'turbine': turbine,
+        'year': timestamps.astype('datetime64[Y]').astype(int) + 1970,
+        'energy_kwh': energy,
+        'valid_hours': valid * time_step_hours,
+        'available_hours': available * time_step_hours,
+        'available_energy_kwh': np.where(available, energy, 0.0),
+        'first': np.where(valid, timestamps, np.datetime64('NaT')),
+        'last': np.where(valid, timestamps, np.datetime64('NaT')),
+    })
+    return merge_partials([chunk.set_index(['turbine', 'year'])])
+
+
+def merge_partials(partials):
+    """Combine partial sums from chunks, files or workers."""
+    combined = pd.concat(partials)
+    aggregation = {column: 'sum' for column in SUM_COLUMNS}
+    aggregation.update({'first': 'min', 'last': 'max'})
+    return combined.groupby(level=['turbine', 'year']).agg(aggregation)
+
+
+def iter_csv_chunks(file, chunksize=100_000, time_column='# Date and time', power_column='Power (kW)'):
+    """Yield (timestamps, power) arrays from a SCADA CSV without loading it whole."""
+    reader = pd.read_csv(file, skiprows=9, usecols=[time_column, power_column], chunksize=chunksize)
+    for chunk in reader:
+        yield pd.to_datetime(chunk[time_column]).to_numpy(), chunk[power_column].to_numpy(dtype=float)
+
+
+def iter_memmap_chunks(timestamp_file, power_file, chunk_rows=1_000_000):
+    """Yield (timestamps, power) slices of memory-mapped .npy arrays."""
+    timestamps = np.load(timestamp_file, mmap_mode='r')
+    power = np.load(power_file, mmap_mode='r')
+    for start in range(0, len(power), chunk_rows):
+        yield timestamps[start:start + chunk_rows], power[start:start + chunk_rows]
+
+
+def reduce_series(turbine, chunks, status_file=None, time_step_hours=TIME_STEP_HOURS):
+    """Reduce an iterable of (timestamps, power) chunks for one turbine.
+
+    When a Status_*.csv log is given, records overlapping a stop are unavailable.
+    """
+    intervals = status_intervals(read_status(status_file)) if status_file else None
+    partials = []
+    for timestamps, power in chunks:
+        available = None
+        if intervals is not None:
+            available = ~interval_mask(timestamps, *intervals)
+        partials.append(reduce_chunk(turbine, timestamps, power, available, time_step_hours))
+    return merge_partials(partials)
+
+
+def _reduce_job(job):
+    turbine, source, status_file, chunksize = job
+    if isinstance(source, tuple):
+        chunks = iter_memmap_chunks(*source, chunk_rows=chunksize)
+    else:
+        chunks = iter_csv_chunks(source, chunksize=chunksize)
+    return reduce_series(turbine, chunks, status_file)
+
+
+def aggregate(jobs, workers=None, chunksize=100_000):
+    """Reduce many series in parallel and merge the partials.
+
+    Each job is (turbine, source, status_file). source is a SCADA CSV path or a
+    (timestamps.npy, power.npy) pair; status_file may be None.
+    """
+    jobs = [(turbine, source, status_file, chunksize) for turbine, source, status_file in jobs]
+    if workers == 1:
+        partials = [_reduce_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            partials = list(pool.map(_reduce_job, jobs))
+    return merge_partials(partials)
+
+
+def summarize(partials, rated_power_kw, target_availability=None, time_step_hours=TIME_STEP_HOURS):
+    """Energy, coverage, availability, AEP and capacity factor per (turbine, year).
+
+    aep_gwh scales the mean power over the hours with data to a full year.
+    aep_availability_weighted_gwh scales the mean power while available by the
+    availability (measured, or target_availability when given).
+    """
+    summary = pd.DataFrame(index=partials.index)
+    period_hours = (partials['last'] - partials['first']) / pd.Timedelta(hours=1) + time_step_hours
+    summary['energy_gwh'] = partials['energy_kwh'] / 1e6
+    summary['data_coverage'] = partials['valid_hours'] / period_hours
+    summary['availability'] = partials['available_hours'] / partials['valid_hours']
+    mean_power_kw = partials['energy_kwh'] / partials['valid_hours']
+    available_power_kw = partials['available_energy_kwh'] / partials['available_hours']
+    availability = summary['availability'] if target_availability is None else target_availability
+    summary['aep_gwh'] = mean_power_kw * HOURS_PER_YEAR / 1e6
+    summary['aep_availability_weighted_gwh'] = available_power_kw * availability * HOURS_PER_YEAR / 1e6
+    summary['capacity_factor'] = mean_power_kw / rated_power_kw
+    return summary
+
+
+def kelmarsh_jobs(folder='Kelmarsh_SCADA_2021_3087'):
+    """Jobs for every Kelmarsh turbine file in folder, paired with its status log."""
+    jobs = []
+    for file in sorted(glob.glob(os.path.join(folder, 'Turbine_Data_Kelmarsh_*.csv'))):
+        turbine = int(os.path.basename(file).split('_')[3])
+        status = glob.glob(os.path.join(folder, f'Status_Kelmarsh_{turbine}_*.csv'))
+        jobs.append((turbine, file, status[0] if status else None))
+    return jobs
+
+
+if __name__ == "__main__":
+    print(summarize(aggregate(kelmarsh_jobs()), rated_power_kw=2050))
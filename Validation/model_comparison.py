@@ -0,0 +1,210 @@
+'''
+Simul8ors
+
+Wake model comparison on the Kelmarsh validation data. The SCADA data is loaded and
+cleaned once, with the same filters and availability mask as Wake_Model_Validation.
+The arrays are then published to shared memory (shared_results.py). Each model is
+solved in a worker process that maps the arrays in place rather than receiving a
+pickled copy. The result is one table with MAE, RMSE, bias and runtime per model.
+
+Models are named by their PyWake literature class, optionally followed by a
+superposition model, e.g. 'Jensen_1983' or 'Bastankhah_PorteAgel_2014+LinearSum'.
+A model that fails gets its error message in the table instead of metrics.
+
+Run from the repository root, which holds the Kelmarsh data (or pass --folder):
+    python Validation/model_comparison.py --models Jensen_1983 Jensen_1983+LinearSum Zong_PorteAgel_2020 --workers 4
+'''
+
+import argparse
+import glob
+import importlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from condition_binning import simulate_binned  # noqa: E402
+from data_quality import (nan_filter, range_filter, stuck_filter, curtailment_filter, availability,  # noqa: E402
+                          run_filters)
+from power_curves import SENVION_POWER, SENVION_WS, fitted_turbines, senvion_turbine  # noqa: E402
+from shared_results import attach, discard, publish  # noqa: E402
+from timeseries_simulator import simulate_chunk  # noqa: E402
+from wind_resource import load_site  # noqa: E402
+
+WAKE_MODELS = {
+    'Jensen_1983': 'py_wake.literature.noj',
+    'Bastankhah_PorteAgel_2014': 'py_wake.literature.gaussian_models',
+    'Niayifar_PorteAgel_2016': 'py_wake.literature.gaussian_models',
+    'Zong_PorteAgel_2020': 'py_wake.literature.gaussian_models',
+    'Nygaard_2022': 'py_wake.literature.turbopark',
+}
+SUPERPOSITION_MODELS = ('LinearSum', 'SquaredSum', 'MaxSum')
+DEFAULT_MODELS = ['Jensen_1983', 'Jensen_1983+LinearSum', 'Bastankhah_PorteAgel_2014', 'Niayifar_PorteAgel_2016',
+                  'Zong_PorteAgel_2020', 'Nygaard_2022']
+
+# Same layout as Wake_Model_Validation: (longitude, latitude, hub_height)
+TURBINE_LOCATIONS = [
+    (-0.947133, 52.400604, 78.5),
+    (-0.949527, 52.402551, 78.5),
+    (-0.94419, 52.403834, 68.5),
+    (-0.94115, 52.398781, 78.5),
+    (-0.940537, 52.402308, 78.5),
+    (-0.936093, 52.400687, 68.5),
+]
+
+
+def make_model(name, site, windTurbines):
+    """PyWake wind farm model for 'LiteratureModel' or 'LiteratureModel+SuperpositionModel'."""
+    model, _, superposition = name.partition('+')
+    if model not in WAKE_MODELS:
+        raise ValueError(f"Unknown wake model {model}; choose from {', '.join(WAKE_MODELS)}")
+    kwargs = {}
+    if superposition:
+        if superposition not in SUPERPOSITION_MODELS:
+            raise ValueError(f"Unknown superposition model {superposition}; choose from "
+                             f"{', '.join(SUPERPOSITION_MODELS)}")
+        kwargs['superpositionModel'] = getattr(importlib.import_module('py_wake.superposition_models'),
+                                               superposition)()
+    return getattr(importlib.import_module(WAKE_MODELS[model]), model)(site, windTurbines, **kwargs)
+
+
+def load_farm_data(folder='Kelmarsh_SCADA_2021_3087', start=None, end=None):
+    """Cleaned farm inflow and observed power, as arrays ready to publish.
+
+    Applies the wake validation's filters and availability mask. Returns the arrays
+    (x, y, h, wd, ws, observed, available), the kept timestamps, the turbine files
+    and their status logs.
+    """
+    from pyproj import Proj
+
+    file_list = sorted(glob.glob(os.path.join(folder, 'Turbine_Data_Kelmarsh_*_2021-01-01_-_2021-07-01_*.csv')))
+    status_files = sorted(glob.glob(os.path.join(folder, 'Status_Kelmarsh_*_2021-01-01_-_2021-07-01_*.csv')))
+    columns = ['Wind speed (m/s)', 'Wind direction (°)', 'Power (kW)']
+    data = pd.concat({f"Turbine_{i}": pd.read_csv(file, skiprows=9, index_col='# Date and time')[columns]
+                      for i, file in enumerate(file_list, start=1)}, axis=1)
+    data.columns = [f"{col[0]}_{col[1]}" for col in data.columns]
+    timestamps = pd.to_datetime(data.index)
+    in_window = np.ones(len(data), dtype=bool)
+    if start is not None:
+        in_window &= timestamps >= pd.Timestamp(start)
+    if end is not None:
+        in_window &= timestamps < pd.Timestamp(end)
+    data = data[in_window]
+
+    speed_columns = [col for col in data.columns if 'Wind speed' in col]
+    direction_columns = [col for col in data.columns if 'Wind direction' in col]
+    power_columns = [col for col in data.columns if 'Power' in col]
+    turbine_available = availability(status_files)
+    keep, quality_report = run_filters(data, [
+        ('missing values', nan_filter(speed_columns + direction_columns + power_columns)),
+        ('no turbine available', lambda frame: ~turbine_available(frame).any(axis=1)),
+        ('wind speed range', range_filter(speed_columns, 0, 40)),
+        ('wind direction range', range_filter(direction_columns, 0, 360)),
+        ('stuck sensors', stuck_filter(speed_columns + direction_columns)),
+        ('curtailment', curtailment_filter(speed_columns, power_columns, SENVION_WS, SENVION_POWER,
+                                           available=turbine_available)),
+    ])
+    print(quality_report)
+    available = turbine_available(data[keep])
+
+    x, y = Proj(proj="utm", zone=33, datum="WGS84")([loc[0] for loc in TURBINE_LOCATIONS],
+                                                     [loc[1] for loc in TURBINE_LOCATIONS])
+    arrays = {
+        'x': np.asarray(x), 'y': np.asarray(y), 'h': np.array([loc[2] for loc in TURBINE_LOCATIONS]),
+        'wd': data.loc[keep, direction_columns].mean(axis=1).to_numpy(),
+        'ws': data.loc[keep, speed_columns].mean(axis=1).to_numpy(),
+        'observed': data.loc[keep, power_columns].where(available).sum(axis=1).to_numpy(),
+        'available': available,
+    }
+    return arrays, data.index[keep], file_list, status_files
+
+
+def evaluate_model(job):
+    """Worker: solve one model over the shared arrays and score its farm power."""
+    handle, name, site, windTurbines, bin_conditions = job
+    data = attach(handle)
+    try:
+        start = time.perf_counter()
+        wind_farm_model = make_model(name, site, windTurbines)
+        # A copy, so no view of the segment is left when it is closed below
+        type_index = np.array(data['type_index']) if 'type_index' in data.keys() else None
+        if bin_conditions:
+            power = simulate_binned(wind_farm_model, data['x'], data['y'], data['h'], data['wd'], data['ws'],
+                                    available=data['available'], error_samples=0, type_index=type_index,
+                                    **bin_conditions)[0]
+        else:
+            power = simulate_chunk(wind_farm_model, data['x'], data['y'], data['h'], data['wd'], data['ws'],
+                                   data['available'], type_index=type_index)
+        runtime = time.perf_counter() - start
+        difference = power.sum(axis=1) - data['observed']
+        return {'model': name, 'mae_kw': float(np.mean(np.abs(difference))),
+                'rmse_kw': float(np.sqrt(np.mean(difference ** 2))), 'bias_kw': float(difference.mean()),
+                'runtime_s': runtime, 'error': None}
+    except Exception as e:
+        return {'model': name, 'mae_kw': np.nan, 'rmse_kw': np.nan, 'bias_kw': np.nan, 'runtime_s': np.nan,
+                'error': f"{type(e).__name__}: {e}"}
+    finally:
+        data.close()
+
+
+def compare_models(models, site, windTurbines, arrays, type_index=None, bin_conditions=None, workers=None):
+    """Comparison table indexed by model, best MAE first.
+
+    arrays are load_farm_data's; they are published once and every worker maps them.
+    bias_kw is mean predicted minus observed farm power, so positive means the model
+    overpredicts. runtime_s covers building the model and solving the series.
+    """
+    arrays = dict(arrays)
+    if type_index is not None:
+        arrays['type_index'] = np.asarray(type_index)
+    handle = publish(arrays)
+    jobs = [(handle, name, site, windTurbines, bin_conditions) for name in models]
+    try:
+        if workers == 1:
+            rows = [evaluate_model(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                rows = list(pool.map(evaluate_model, jobs))
+    finally:
+        discard(handle)
+    return pd.DataFrame(rows).set_index('model').sort_values('mae_kw')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models', nargs='+', default=DEFAULT_MODELS)
+    parser.add_argument('--folder', default='Kelmarsh_SCADA_2021_3087')
+    parser.add_argument('--start', help='first timestamp of the window')
+    parser.add_argument('--end', help='end of the window (exclusive)')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--ws-step', type=float, default=0.5)
+    parser.add_argument('--wd-step', type=float, default=2.0)
+    parser.add_argument('--no-binning', action='store_true', help='solve every timestamp exactly')
+    parser.add_argument('--curve-source', choices=('manufacturer', 'scada'), default='manufacturer')
+    parser.add_argument('--fit-window', nargs=2, default=('2021-01-01', '2021-04-01'))
+    parser.add_argument('--output', help='also write the table to this CSV')
+    args = parser.parse_args()
+
+    arrays, timestamps, file_list, status_files = load_farm_data(args.folder, args.start, args.end)
+    print(f"Kept {len(timestamps)} timestamps")
+    site = load_site(file_list)
+    if args.curve_source == 'scada':
+        windTurbines = fitted_turbines(file_list, status_files, *args.fit_window, hub_height=78.5,
+                                       curtailment_curve=(SENVION_WS, SENVION_POWER))
+        type_index = np.arange(len(file_list))
+    else:
+        windTurbines, type_index = senvion_turbine(hub_height=78.5), None
+    bin_conditions = None if args.no_binning else {'ws_step': args.ws_step, 'wd_step': args.wd_step}
+    table = compare_models(args.models, site, windTurbines, arrays, type_index, bin_conditions, args.workers)
+    print(table.to_string())
+    if args.output:
+        table.to_csv(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+'''
+Simul8ors
+
+Empirical power and Ct curves from SCADA. Each turbine's file is streamed in chunks.
+Records outside the data window, records during the turbine's own stops, icing or
+lost communication, and (optionally) curtailed records are dropped. The rest are
+binned by wind speed with bincount (method of bins): mean wind speed and mean power
+per bin, and bins with fewer than min_count records are dropped.
+
+SCADA has no thrust signal, so Ct is estimated from the measured power coefficient
+with 1D momentum theory: Cp = 4a(1 - a)^2 and Ct = 4a(1 - a). This ignores rotor
+losses, so it runs a little below a manufacturer Ct.
+
+Fitted curves are cached as CSV, keyed by the turbine's files, the window and the
+fit settings, so later runs load them without touching the raw data.
+power_ct_tabular turns a curve into a PyWake PowerCtTabular.
+
+The Senvion MM92 manufacturer curve used by the validations also lives here.
+'''
+
+import inspect
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from py_wake.wind_turbines import WindTurbine, WindTurbines
+from py_wake.wind_turbines.power_ct_functions import PowerCtTabular
+
+from data_quality import interval_mask, read_status, status_intervals
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_cache import atomic_write, cache_key  # noqa: E402
+
+TIME_COLUMN = '# Date and time'
+SPEED_COLUMN = 'Wind speed (m/s)'
+POWER_COLUMN = 'Power (kW)'
+AIR_DENSITY = 1.225
+
+# Senvion MM92 manufacturer curve
+SENVION_DIAMETER = 92.5
+SENVION_WS = np.array([3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24])
+SENVION_CT = np.array([0.98, 0.87, 0.79, 0.79, 0.79, 0.79, 0.74, 0.69, 0.54, 0.39, 0.29, 0.23, 0.19,
+                       0.15, 0.13, 0.11, 0.09, 0.08, 0.07, 0.06, 0.06, 0.05])
+SENVION_POWER = np.array([20, 94, 205, 391, 645, 979, 1375, 1795, 2000, 2040, 2050, 2050, 2050, 2050,
+                          2050, 2050, 2050, 2050, 2050, 2050, 2050, 2050])  # kW
+
+
+def senvion_turbine(hub_height=78.5):
+    """Senvion MM92 with the manufacturer power and Ct curve."""
+    return WindTurbine(name='Senvion MM92', diameter=SENVION_DIAMETER, hub_height=hub_height,
+                       powerCtFunction=PowerCtTabular(SENVION_WS, SENVION_POWER, 'kW', SENVION_CT))
+
+
+def bin_power_curve(ws, power, ws_bins):
+    """Record count, summed wind speed and summed power (kW) per wind speed bin."""
+    ws = np.asarray(ws, dtype=float)
+    power = np.asarray(power, dtype=float)
+    index = np.digitize(ws, ws_bins) - 1
+    inside = (index >= 0) & (index < len(ws_bins) - 1) & np.isfinite(ws) & np.isfinite(power)
+    n_bins = len(ws_bins) - 1
+    return (np.bincount(index[inside], minlength=n_bins),
+            np.bincount(index[inside], ws[inside], minlength=n_bins),
+            np.bincount(index[inside], power[inside], minlength=n_bins))
+
+
+def ct_from_power(ws, power_kw, diameter, air_density=AIR_DENSITY):
+    """Ct from the power coefficient with 1D momentum theory, on the a <= 1/3 branch."""
+    ws = np.asarray(ws, dtype=float)
+    area = np.pi * (diameter / 2) ** 2
+    cp = np.clip(np.asarray(power_kw, dtype=float) * 1000 / (0.5 * air_density * area * ws ** 3), 0, 16 / 27)
+    # Cp = 4a(1 - a)^2 increases on [0, 1/3], so bisection finds a for every bin at once
+    low, high = np.zeros_like(cp), np.full_like(cp, 1 / 3)
+    for _ in range(40):
+        a = (low + high) / 2
+        below = 4 * a * (1 - a) ** 2 < cp
+        low = np.where(below, a, low)
+        high = np.where(below, high, a)
+    a = (low + high) / 2
+    return 4 * a * (1 - a)
+
+
+def fit_power_curve(file, status_file=None, start=None, end=None, ws_bins=np.arange(0, 26.5, 0.5), min_count=10,
+                    diameter=SENVION_DIAMETER, air_density=AIR_DENSITY, curtailment_curve=None, fraction=0.5,
+                    statuses=('Stop',), messages=('Icing', 'communication'), chunksize=100_000):
+    """Binned power curve of one turbine: a frame with ws, power_kw, ct and count per kept bin.
+
+    start and end bound the data window (end exclusive). curtailment_curve is an
+    optional (ws, power_kw) reference; records below fraction of it are dropped, as in
+    data_quality.curtailment_filter.
+    """
+    intervals = None if status_file is None else status_intervals(read_status(status_file), statuses, messages)
+    counts = np.zeros(len(ws_bins) - 1, dtype=np.int64)
+    ws_sum = np.zeros(len(ws_bins) - 1)
+    power_sum = np.zeros(len(ws_bins) - 1)
+    for chunk in pd.read_csv(file, skiprows=9, usecols=[TIME_COLUMN, SPEED_COLUMN, POWER_COLUMN],
+                             chunksize=chunksize):
+        timestamps = pd.to_datetime(chunk[TIME_COLUMN])
+        keep = np.ones(len(chunk), dtype=bool)
+        if start is not None:
+            keep &= (timestamps >= pd.Timestamp(start)).to_numpy()
+        if end is not None:
+            keep &= (timestamps < pd.Timestamp(end)).to_numpy()
+        if intervals is not None:
+            keep &= ~interval_mask(timestamps, *intervals)
+        ws = chunk[SPEED_COLUMN].to_numpy(dtype=float)
+        power = chunk[POWER_COLUMN].to_numpy(dtype=float)
+        if curtailment_curve is not None:
+            expected = np.interp(ws, *curtailment_curve, left=0.0, right=0.0)
+            with np.errstate(invalid='ignore'):
+                keep &= ~((expected >= 100.0) & (power < fraction * expected))
+        chunk_counts, chunk_ws, chunk_power = bin_power_curve(ws[keep], power[keep], ws_bins)
+        counts += chunk_counts
+        ws_sum += chunk_ws
+        power_sum += chunk_power
+
+    kept = counts >= min_count
+    ws = ws_sum[kept] / counts[kept]
+    power = np.maximum(power_sum[kept] / counts[kept], 0.0)
+    return pd.DataFrame({'ws': ws, 'power_kw': power, 'ct': ct_from_power(ws, power, diameter, air_density),
+                         'count': counts[kept]})
+
+
+def load_power_curve(file, status_file=None, start=None, end=None, cache_dir='power_curve_cache', **fit):
+    """Fitted power curve for one turbine and data window, from the cache when the inputs have not changed.
+
+    Keyword arguments are passed to fit_power_curve. They are part of the cache key,
+    with fit_power_curve's defaults for any that are not given.
+    """
+    settings = inspect.signature(fit_power_curve).bind(file, status_file, start, end, **fit)
+    settings.apply_defaults()
+    settings = {name: value for name, value in settings.arguments.items()
+                if name not in ('file', 'status_file', 'chunksize')}
+    key = cache_key([file, status_file], **settings)
+    path = os.path.join(cache_dir, f'curve_{key}.csv')
+    if os.path.exists(path):
+        return pd.read_csv(path)
+    curve = fit_power_curve(file, status_file, start, end, **fit)
+    os.makedirs(cache_dir, exist_ok=True)
+    with atomic_write(path, 'w', newline='') as f:
+        curve.to_csv(f, index=False)
+    return curve
+
+
+def power_ct_tabular(curve):
+    """PyWake PowerCtTabular from a fitted curve."""
+    return PowerCtTabular(curve['ws'].to_numpy(), curve['power_kw'].to_numpy(), 'kW', curve['ct'].to_numpy())
+
+
+def fitted_turbines(files, status_files, start=None, end=None, diameter=SENVION_DIAMETER, hub_height=78.5,
+                    name='Senvion MM92', **fit):
+    """WindTurbines with one type per turbine, each with its own fitted curve.
+
+    Pass type=numpy.arange(len(files)) in the solves so turbine i uses curve i.
+    """
+    turbines = []
+    for i, (file, status_file) in enumerate(zip(files, status_files), start=1):
+        curve = load_power_curve(file, status_file, start, end, diameter=diameter, **fit)
+        turbines.append(WindTurbine(name=f'{name} {i}', diameter=diameter, hub_height=hub_height,
+                                    powerCtFunction=power_ct_tabular(curve)))
+    return WindTurbines.from_WindTurbine_lst(turbines)
+
+
+if __name__ == "__main__":
+    import glob
+    files = sorted(glob.glob('Kelmarsh_SCADA_2021_3087/Turbine_Data_Kelmarsh_*.csv'))
+    status_files = sorted(glob.glob('Kelmarsh_SCADA_2021_3087/Status_Kelmarsh_*.csv'))
+    for i, (file, status_file) in enumerate(zip(files, status_files), start=1):
+        curve = load_power_curve(file, status_file, curtailment_curve=(SENVION_WS, SENVION_POWER))
+        print(f"Turbine {i}: {curve['count'].sum()} records in {len(curve)} bins")
+        print(curve.to_string(index=False))
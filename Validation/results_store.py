@@ -0,0 +1,75 @@
+'''
+Simul8ors
+
+Append-only store for per-timestamp validation results. Results live under one
+directory per model configuration (keyed by a hash of the configuration), written as
+numbered part files. Every checkpoint adds a new part and existing parts are never
+rewritten, so an interrupted run loses at most the rows since its last checkpoint and
+a rerun only has to simulate timestamps the store has not seen yet.
+'''
+
+import glob
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_cache import atomic_write  # noqa: E402
+
+
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def config_hash(config):
+    """Stable short hash of a JSON-serialisable model configuration."""
+    text = json.dumps(config, sort_keys=True, default=_json_default)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+class ResultsStore:
+
+    def __init__(self, root, config, columns=('observed', 'predicted')):
+        self.key = config_hash(config)
+        self.path = os.path.join(root, self.key)
+        self.columns = list(columns)
+        os.makedirs(self.path, exist_ok=True)
+        manifest = os.path.join(self.path, 'config.json')
+        if not os.path.exists(manifest):
+            with open(manifest, 'w') as f:
+                json.dump(config, f, indent=2, sort_keys=True, default=_json_default)
+
+    def _parts(self):
+        return sorted(glob.glob(os.path.join(self.path, 'part-*.csv')))
+
+    def load(self):
+        """All stored rows, indexed by timestamp. Later parts win on duplicates."""
+        parts = [pd.read_csv(part, index_col='timestamp') for part in self._parts()]
+        if not parts:
+            return pd.DataFrame(columns=self.columns, index=pd.Index([], name='timestamp'))
+        results = pd.concat(parts)
+        return results[~results.index.duplicated(keep='last')]
+
+    def seen(self):
+        """Timestamps that already have stored results."""
+        return set(self.load().index)
+
+    def append(self, rows):
+        """Write rows (a list of (timestamp, *values) tuples) as a new part file."""
+        if not rows:
+            return
+        frame = pd.DataFrame(rows, columns=['timestamp'] + self.columns).set_index('timestamp')
+        parts = self._parts()
+        number = int(os.path.basename(parts[-1])[5:10]) + 1 if parts else 0
+        final = os.path.join(self.path, f'part-{number:05d}.csv')
+        with atomic_write(final, 'w', newline='') as f:
+            frame.to_csv(f)
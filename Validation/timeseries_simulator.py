@@ -0,0 +1,149 @@
+'''
+Simul8ors
+
+Streaming time-series simulation. A measured inflow series (wind speed and direction per
+10-minute timestamp) is fed through a PyWake wind farm model in fixed-size chunks, and
+each chunk's per-turbine power is appended to a columnar output directory as soon as it
+is solved. Memory use is bounded by the chunk size, however long the series is.
+
+Output layout (one raw little-endian file per column, plus a manifest):
+    out/columns.json   {"rows": n, "columns": {"time": "<i8", "ws": "<f4", ...}}
+    out/time.bin       timestamps as int64 nanoseconds since 1970
+    out/ws.bin, wd.bin inflow used for each row
+    out/power_1.bin .. per-turbine power in kW
+open_columns memory-maps every column without reading it.
+'''
+
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_cache import atomic_write  # noqa: E402
+
+MANIFEST = 'columns.json'
+
+
+def iter_inflow_csv(file, time_column='# Date and time', ws_column='Wind speed (m/s)',
+                    wd_column='Wind direction (°)', chunksize=10_000, skiprows=9):
+    """Yield inflow chunks (index time, columns ws and wd) from a CSV, dropping incomplete rows."""
+    reader = pd.read_csv(file, skiprows=skiprows, usecols=[time_column, ws_column, wd_column],
+                         chunksize=chunksize)
+    for chunk in reader:
+        chunk = chunk.dropna()
+        yield pd.DataFrame({'ws': chunk[ws_column].to_numpy(dtype=float),
+                            'wd': chunk[wd_column].to_numpy(dtype=float)},
+                           index=pd.to_datetime(chunk[time_column]))
+
+
+def iter_inflow_frame(frame, chunksize=10_000):
+    """Yield chunks of an in-memory inflow frame with ws and wd columns."""
+    for start in range(0, len(frame), chunksize):
+        yield frame.iloc[start:start + chunksize]
+
+
+def simulate_chunk(wind_farm_model, x, y, h, wd, ws, available=None, ti=None, type_index=None):
+    """Power in kW per timestamp and turbine, shape (time, turbine), from time-series solves.
+
+    ti is an optional turbulence intensity per timestamp; by default the site's is used.
+    type_index is the optional per-turbine type of a model with several turbine types.
+
+    available is an optional (time, turbine) boolean mask. Unavailable turbines are left
+    out of the wake solve and get zero power. Timestamps are grouped by availability
+    pattern, so each pattern is solved once over only its available turbines.
+    Timestamps where no turbine is available are not solved at all.
+    """
+    x, y, h = np.asarray(x), np.asarray(y), np.asarray(h)
+    wd, ws = np.asarray(wd), np.asarray(ws)
+    inflow = {} if ti is None else {'TI': np.asarray(ti)}
+    type_index = np.zeros(len(x), dtype=int) if type_index is None else np.asarray(type_index)
+    if available is None:
+        simulation_result = wind_farm_model(x=x, y=y, h=h, type=type_index, wd=wd, ws=ws, time=True, **inflow)
+        return simulation_result.Power.values.T / 1000
+    available = np.asarray(available, dtype=bool)
+    power = np.zeros((len(wd), len(x)))
+    patterns, group = np.unique(available, axis=0, return_inverse=True)
+    group = group.reshape(-1)
+    for g, pattern in enumerate(patterns):
+        if not pattern.any():
+            continue
+        rows = np.flatnonzero(group == g)
+        rows_inflow = {name: value[rows] for name, value in inflow.items()}
+        simulation_result = wind_farm_model(x=x[pattern], y=y[pattern], h=h[pattern], type=type_index[pattern],
+                                            wd=wd[rows], ws=ws[rows], time=True, **rows_inflow)
+        power[np.ix_(rows, np.flatnonzero(pattern))] = simulation_result.Power.values.T / 1000
+    return power
+
+
+class ColumnarWriter:
+
+    def __init__(self, path, columns):
+        """Start a new output at path; columns maps column name to NumPy dtype."""
+        self.path = path
+        self.columns = {name: np.dtype(dtype).newbyteorder('<') for name, dtype in columns.items()}
+        self.rows = 0
+        os.makedirs(path, exist_ok=True)
+        for name in self.columns:
+            open(self._file(name), 'wb').close()
+        self._write_manifest()
+
+    def _file(self, name):
+        return os.path.join(self.path, f'{name}.bin')
+
+    def _write_manifest(self):
+        manifest = {'rows': self.rows, 'columns': {name: dtype.str for name, dtype in self.columns.items()}}
+        with atomic_write(os.path.join(self.path, MANIFEST), 'w') as f:
+            json.dump(manifest, f)
+
+    def append(self, values):
+        """Append one chunk; values maps every column name to an array of the same length."""
+        lengths = {len(values[name]) for name in self.columns}
+        if len(lengths) != 1:
+            raise ValueError(f"Columns have different lengths: {lengths}")
+        for name, dtype in self.columns.items():
+            with open(self._file(name), 'ab') as f:
+                np.ascontiguousarray(values[name], dtype=dtype).tofile(f)
+        # Rows only count once every column has been written, so readers never see a torn chunk
+        self.rows += lengths.pop()
+        self._write_manifest()
+
+
+def open_columns(path):
+    """Memory-map every column of an output directory (read-only)."""
+    with open(os.path.join(path, MANIFEST)) as f:
+        manifest = json.load(f)
+    rows = manifest['rows']
+    if rows == 0:
+        # An empty file cannot be memory-mapped
+        return {name: np.empty(0, dtype=np.dtype(dtype)) for name, dtype in manifest['columns'].items()}
+    return {name: np.memmap(os.path.join(path, f'{name}.bin'), dtype=np.dtype(dtype), mode='r', shape=(rows,))
+            for name, dtype in manifest['columns'].items()}
+
+
+def simulate_stream(wind_farm_model, x, y, h, inflow_chunks, out_path, dtype='float32', available=None,
+                    type_index=None):
+    """Simulate every inflow chunk and append its per-turbine power to out_path.
+
+    available is an optional function of a chunk giving its (time, turbine)
+    availability, such as data_quality.availability(status_files). type_index is
+    passed to simulate_chunk.
+    Returns the number of rows written.
+    """
+    n_turbines = len(x)
+    columns = {'time': 'int64', 'ws': dtype, 'wd': dtype}
+    columns.update({f'power_{i + 1}': dtype for i in range(n_turbines)})
+    writer = ColumnarWriter(out_path, columns)
+    for chunk in inflow_chunks:
+        if len(chunk) == 0:
+            continue
+        power = simulate_chunk(wind_farm_model, x, y, h, chunk['wd'], chunk['ws'],
+                               None if available is None else available(chunk), type_index=type_index)
+        values = {'time': pd.to_datetime(chunk.index).asi8, 'ws': chunk['ws'], 'wd': chunk['wd']}
+        values.update({f'power_{i + 1}': power[:, i] for i in range(n_turbines)})
+        writer.append(values)
+        print(f"{writer.rows} timestamps written to {out_path}")
+    return writer.rows
@@ -0,0 +1,139 @@
+'''
+Simul8ors
+
+Wind resource assessment from SCADA. Wind speed and direction columns are streamed in
+chunks through a 2D (direction sector x wind speed) histogram, and per-sector Weibull
+A/k and frequency are fitted from it. Turbulence intensity per bin comes from the
+10-minute wind speed standard deviation. The fitted arrays are cached as .npz, keyed
+by the input files and binning, so later runs rebuild the PyWake XRSite from them
+without touching the raw data. The cache holds plain arrays only, so loading one never
+unpickles anything.
+'''
+
+import glob
+import math
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+from py_wake.site import XRSite
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_cache import atomic_write, cache_key  # noqa: E402
+
+SPEED_COLUMN = 'Wind speed (m/s)'
+DIRECTION_COLUMN = 'Wind direction (°)'
+STD_COLUMN = 'Wind speed, Standard deviation (m/s)'
+DEFAULT_TI = 0.1
+SITE_ARRAYS = ('wd', 'ws', 'Sector_frequency', 'Weibull_A', 'Weibull_k', 'TI')
+
+
+def accumulate_histogram(files, n_sectors=12, ws_bins=np.arange(0, 31), chunksize=100_000):
+    """Counts and summed wind speed variance per (sector, ws bin), read in chunks."""
+    sector_width = 360 / n_sectors
+    wd_edges = np.arange(n_sectors + 1) * sector_width
+    counts = np.zeros((n_sectors, len(ws_bins) - 1))
+    variance = np.zeros_like(counts)
+    variance_counts = np.zeros_like(counts)
+    for file in files:
+        header = pd.read_csv(file, skiprows=9, nrows=0).columns
+        columns = [SPEED_COLUMN, DIRECTION_COLUMN] + ([STD_COLUMN] if STD_COLUMN in header else [])
+        for chunk in pd.read_csv(file, skiprows=9, usecols=columns, chunksize=chunksize):
+            ws = chunk[SPEED_COLUMN].to_numpy(dtype=float)
+            # Sectors are centred on 0, 30, ...; shift so the first one straddles north
+            wd = (chunk[DIRECTION_COLUMN].to_numpy(dtype=float) + sector_width / 2) % 360
+            valid = ~(np.isnan(ws) | np.isnan(wd))
+            counts += np.histogram2d(wd[valid], ws[valid], bins=[wd_edges, ws_bins])[0]
+            if STD_COLUMN in columns:
+                std = chunk[STD_COLUMN].to_numpy(dtype=float)
+                valid &= ~np.isnan(std)
+                variance += np.histogram2d(wd[valid], ws[valid], bins=[wd_edges, ws_bins],
+                                           weights=std[valid] ** 2)[0]
+                variance_counts += np.histogram2d(wd[valid], ws[valid], bins=[wd_edges, ws_bins])[0]
+    return counts, variance, variance_counts
+
+
+def fit_weibull(counts, ws_bins):
+    """Per-sector Weibull A and k from binned wind speed counts (method of moments)."""
+    centers = (ws_bins[:-1] + ws_bins[1:]) / 2
+    totals = counts.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = (counts * centers).sum(axis=1) / totals
+        std = np.sqrt((counts * (centers - mean[:, None]) ** 2).sum(axis=1) / totals)
+        k = (std / mean) ** -1.086
+    k = np.where(np.isfinite(k), k, 2.0)
+    gamma = np.array([math.gamma(1 + 1 / value) for value in k])
+    A = np.where(np.isfinite(mean), mean / gamma, 0.0)
+    return A, k
+
+
+def estimate_ti(variance, variance_counts, ws_bins):
+    """TI per (sector, ws bin) as sqrt(mean variance) / bin centre, filled where bins are empty."""
+    centers = (ws_bins[:-1] + ws_bins[1:]) / 2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ti = np.sqrt(variance / variance_counts) / centers
+        overall = np.sqrt(variance.sum(axis=0) / variance_counts.sum(axis=0)) / centers
+    # Empty bins take the all-sector value for their speed, then the default
+    ti = np.where(np.isfinite(ti), ti, overall)
+    return np.where(np.isfinite(ti), ti, DEFAULT_TI)
+
+
+def fit_site_arrays(files, n_sectors=12, ws_bins=np.arange(0, 31), chunksize=100_000):
+    """Per-sector frequency, Weibull A/k and TI(wd, ws) from SCADA files, keyed as in SITE_ARRAYS."""
+    counts, variance, variance_counts = accumulate_histogram(files, n_sectors, ws_bins, chunksize)
+    A, k = fit_weibull(counts, ws_bins)
+    return {'wd': np.arange(n_sectors) * 360 / n_sectors, 'ws': (ws_bins[:-1] + ws_bins[1:]) / 2,
+            'Sector_frequency': counts.sum(axis=1) / counts.sum(), 'Weibull_A': A, 'Weibull_k': k,
+            'TI': estimate_ti(variance, variance_counts, ws_bins)}
+
+
+def site_from_arrays(arrays):
+    """XRSite from fitted site arrays."""
+    ds = xr.Dataset(
+        data_vars={'Sector_frequency': ('wd', arrays['Sector_frequency']), 'Weibull_A': ('wd', arrays['Weibull_A']),
+                   'Weibull_k': ('wd', arrays['Weibull_k']), 'TI': (('wd', 'ws'), arrays['TI'])},
+        coords={'wd': arrays['wd'], 'ws': arrays['ws']})
+    return XRSite(ds)
+
+
+def build_site(files, n_sectors=12, ws_bins=np.arange(0, 31), chunksize=100_000):
+    """Fit an XRSite with per-sector frequency, Weibull A/k and TI(wd, ws) from SCADA files."""
+    return site_from_arrays(fit_site_arrays(files, n_sectors, ws_bins, chunksize))
+
+
+def save_site_arrays(path, arrays):
+    """Write fitted site arrays to an .npz file."""
+    with atomic_write(path) as f:
+        np.savez(f, **{name: np.asarray(arrays[name], dtype=float) for name in SITE_ARRAYS})
+
+
+def read_site(path):
+    """XRSite from an .npz written by save_site_arrays; nothing is unpickled."""
+    with np.load(path, allow_pickle=False) as data:
+        return site_from_arrays({name: data[name] for name in SITE_ARRAYS})
+
+
+def load_site(files=None, n_sectors=12, ws_bins=np.arange(0, 31), cache_dir='wind_resource_cache'):
+    """Fitted site for the SCADA files, from the cache when the inputs have not changed.
+
+    Defaults to every Kelmarsh turbine file. The fitted arrays are also copied to
+    cache_dir/site.npz, which the GUI loads through "Load Wind Resource".
+    """
+    if files is None:
+        files = sorted(glob.glob('Kelmarsh_SCADA_2021_3087/Turbine_Data_Kelmarsh_*.csv'))
+    path = os.path.join(cache_dir, f'site_{cache_key(sorted(files), n_sectors=n_sectors, ws_bins=ws_bins)}.npz')
+    if os.path.exists(path):
+        return read_site(path)
+    arrays = fit_site_arrays(files, n_sectors, ws_bins)
+    os.makedirs(cache_dir, exist_ok=True)
+    for target in (path, os.path.join(cache_dir, 'site.npz')):
+        save_site_arrays(target, arrays)
+    return site_from_arrays(arrays)
+
+
+if __name__ == "__main__":
+    site = load_site()
+    print(site.ds)
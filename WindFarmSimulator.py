@@ -1,22 +1,33 @@
 # Imports:
+# PyWake is not imported here; farm_model imports it on first use, and warm_up
+# pre-imports it on a background thread once the window is up.
 
+import os
+import threading
 import tkinter as tk
-from tkinter import ttk, filedialog, simpledialog
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import ttk, filedialog, simpledialog, messagebox
 
 import numpy as np
 import matplotlib.pyplot as plt
 
-import py_wake
-from py_wake import NOJ
-from py_wake.examples.data.hornsrev1 import V80
-from py_wake.examples.data.iea37 import IEA37_WindTurbines
-from py_wake.examples.data.dtu10mw import DTU10MW
-from py_wake.site import UniformSite
-from py_wake.wind_turbines.generic_wind_turbines import GenericWindTurbine
-
-from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from PIL import Image
+
+from farm_model import (FEET_TO_METERS, direction_to_degrees, load_site, make_mixed_steering_model,
+                        make_mixed_wind_farm_model, warm_up)
+from wake_overlay import WakeOverlay
+from direction_sweep import DirectionSweep
+from render_scheduler import RenderScheduler
+from session import Session, save_session
+from uncertainty import run_uncertainty
+from flow_map_export import export_flow_map, grid_for_layout
+from layout_io import load_layout, save_layout
+from wake_graph import build_wake_graph, sparse_aep
+from wake_losses import draw_efficiency, farm_loss, save_breakdown, wake_loss_breakdown
+from yaw_optimization import aep_with_yaw, load_yaw_table, optimize_yaw, save_yaw_table
+
+# Above this many turbines, Submit solves independent wake clusters separately (see wake_graph.py)
+SPARSE_MIN_TURBINES = 200
 
 
 class WindFarmSimulator:
@@ -35,14 +46,28 @@ class WindFarmSimulator:
         # Initialize attributes
         self.max_turbines = 10
         self.coordinates = []
+        self.turbine_types = []
+        self.turbine_heights = []
         self.plotted_points = []
         self.pixel_to_real_ratio = 1.0
         self.map_aspect_ratio = 1.0
         self.map_image = None
+        self.map_path = None
+        self.site = None
+        self.site_path = None
+        self.last_result = {}
+        self.yaw_table = None
+        self.efficiency_artists = []
+        self.session = None
         self.is_panning = False
         self.pan_start = None
         self.scale_mode = False
         self.coordinates_in_meters = []
+        self.canvas_size = None
+        self.recorder = None
+        self.uncertainty_pool = None
+        self.uncertainty_future = None
+        self.uncertainty_stop = threading.Event()
 
         # Add controls
         self.add_description()
@@ -56,11 +81,16 @@ class WindFarmSimulator:
         self.ax.set_xlim(0, 100)
         self.ax.set_ylim(0, 100)
         self.ax.set_aspect('equal')
+        # Every turbine is drawn by this one artist, so large layouts stay cheap to draw
+        self.turbine_points, = self.ax.plot([], [], 'ro', linestyle='none', zorder=3)
 
         self.canvas = FigureCanvasTkAgg(self.fig, master=self.canvas_frame)
         self.canvas_widget = self.canvas.get_tk_widget()
         self.canvas_widget.pack(fill=tk.BOTH, expand=True)
 
+        # Resize, pan and zoom only request a redraw; renders are coalesced to one per frame
+        self.renderer = RenderScheduler(self.root, self.canvas.draw, self.view_state)
+
         # Add controls and events
         self.root.bind("<Configure>", self.on_resize)
         self.root.bind("<KeyPress>", self.on_key_press)
@@ -68,6 +98,39 @@ class WindFarmSimulator:
         self.canvas.mpl_connect("button_press_event", self.on_click)
         self.canvas.mpl_connect("scroll_event", self.on_scroll)
 
+        # Live wake overlay, recomputed in the background after placement, zoom or settings changes
+        self.wake_overlay = WakeOverlay(self)
+        for combo in (self.speed_combo, self.direction_combo, self.type_combo, self.d_combo, self.h_combo):
+            combo.bind("<<ComboboxSelected>>", self.wake_overlay.schedule)
+        # Pre-rendered direction sweep, played back on the same canvas
+        self.direction_sweep = DirectionSweep(self)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Import the scientific stack in the background once the window has been drawn
+        self.warm_up_done = threading.Event()
+        self.root.after(100, self.start_warm_up)
+
+    def start_warm_up(self):
+        def run():
+            try:
+                warm_up()
+            except Exception as e:
+                print(f"Warm-up failed: {e}")
+            self.warm_up_done.set()
+        threading.Thread(target=run, daemon=True).start()
+
+    def on_close(self):
+        # Stop the overlay and sweep workers and unlink their shared memory before the window goes away
+        self.wake_overlay.close()
+        self.direction_sweep.close()
+        if self.uncertainty_pool is not None:
+            # A running Monte Carlo stops after its current round
+            self.uncertainty_stop.set()
+            self.uncertainty_pool.shutdown(wait=False, cancel_futures=True)
+        if self.recorder is not None:
+            self.recorder.close()
+        self.root.destroy()
+
     def add_description(self):
         """Add description at the top of the control panel."""
         s1 = "This is the project for Team Simul8tors - Ang Gao, Chase Johnson, Leo Kern."
@@ -124,12 +187,72 @@ class WindFarmSimulator:
         load_button = tk.Button(self.control_frame, text="Load Map", command=self.load_map, bg="white")
         load_button.pack(pady=10, anchor="w")
 
+        resource_button = tk.Button(self.control_frame, text="Load Wind Resource", command=self.load_wind_resource,
+                                    bg="white")
+        resource_button.pack(pady=10, anchor="w")
+
         submit_button = tk.Button(self.control_frame, text="Submit Settings", command=self.get_selection, bg="white")
         submit_button.pack(pady=10, anchor="w")
 
         convert_button = tk.Button(self.control_frame, text="Convert to Meters", command=self.convert_to_meters, bg="white")
         convert_button.pack(pady=10, anchor="w")
 
+        uncertainty_button = tk.Button(self.control_frame, text="AEP Uncertainty (P50/P90)",
+                                       command=self.run_aep_uncertainty, bg="white")
+        uncertainty_button.pack(pady=10, anchor="w")
+
+        export_button = tk.Button(self.control_frame, text="Export Flow Map", command=self.export_flow_map,
+                                  bg="white")
+        export_button.pack(pady=10, anchor="w")
+
+        yaw_button = tk.Button(self.control_frame, text="Optimize Yaw", command=self.run_yaw_optimization,
+                               bg="white")
+        yaw_button.pack(pady=10, anchor="w")
+
+        load_yaw_button = tk.Button(self.control_frame, text="Load Yaw Table", command=self.load_yaw_table,
+                                    bg="white")
+        load_yaw_button.pack(pady=10, anchor="w")
+
+        losses_button = tk.Button(self.control_frame, text="Wake Loss Breakdown", command=self.run_wake_loss_breakdown,
+                                  bg="white")
+        losses_button.pack(pady=10, anchor="w")
+
+        import_layout_button = tk.Button(self.control_frame, text="Import Layout", command=self.import_layout,
+                                         bg="white")
+        import_layout_button.pack(pady=10, anchor="w")
+
+        export_layout_button = tk.Button(self.control_frame, text="Export Layout", command=self.export_layout,
+                                         bg="white")
+        export_layout_button.pack(pady=10, anchor="w")
+
+        save_button = tk.Button(self.control_frame, text="Save Session", command=self.save_session, bg="white")
+        save_button.pack(pady=10, anchor="w")
+
+        restore_button = tk.Button(self.control_frame, text="Load Session", command=self.load_session, bg="white")
+        restore_button.pack(pady=10, anchor="w")
+
+        self.overlay_var = tk.BooleanVar(value=True)
+        overlay_check = tk.Checkbutton(self.control_frame, text="Live Wake Overlay", variable=self.overlay_var,
+                                       command=self.toggle_wake_overlay, bg="lightgray")
+        overlay_check.pack(pady=10, anchor="w")
+
+        self.jit_var = tk.BooleanVar(value=False)
+        jit_check = tk.Checkbutton(self.control_frame, text="Fast NOJ Kernel (Numba)", variable=self.jit_var,
+                                   command=self.toggle_jit_backend, bg="lightgray")
+        jit_check.pack(pady=10, anchor="w")
+
+        sweep_button = tk.Button(self.control_frame, text="Direction Sweep", command=self.build_direction_sweep,
+                                 bg="white")
+        sweep_button.pack(pady=10, anchor="w")
+
+        play_button = tk.Button(self.control_frame, text="Play / Pause Sweep", command=self.toggle_sweep_playback,
+                                bg="white")
+        play_button.pack(pady=10, anchor="w")
+
+        self.sweep_slider = tk.Scale(self.control_frame, from_=0, to=355, resolution=5, orient=tk.HORIZONTAL,
+                                     label="Sweep Direction (deg)", command=self.seek_sweep, bg="lightgray")
+        self.sweep_slider.pack(pady=5, anchor="w")
+
     def add_turbine_slider(self):
         """Add a slider to control the maximum number of turbines."""
         slider_label = tk.Label(self.control_frame, text="Max Turbines:", bg="lightgray")
@@ -157,9 +280,192 @@ class WindFarmSimulator:
         self.run_simulation(wind_speed, wind_direction, t, diameter, hub_height, self.coordinates_in_meters)
         self.coordinates_in_meters = [] #resets the turbine locations
 
+    def run_aep_uncertainty(self):
+        """Start a Monte Carlo P50/P90 AEP for the current layout and settings in the background."""
+        if self.uncertainty_future is not None:
+            print("AEP uncertainty is already running.")
+            return
+        farm_loc = self.convert_to_meters()
+        if not farm_loc:
+            print("Place at least one turbine first.")
+            return
+        speed = float(self.speed_combo.get())
+        d = direction_to_degrees(self.direction_combo.get())
+        Type = self.type_combo.get()
+        if self.uncertainty_pool is None:
+            self.uncertainty_pool = ThreadPoolExecutor(max_workers=1)
+        # The samples are solved on run_uncertainty's own process pool; this thread only waits for them,
+        # and the result is picked up by polling so the window stays responsive
+        self.uncertainty_future = self.uncertainty_pool.submit(
+            run_uncertainty, Type, self.d_combo.get(), self.h_combo.get(), [loc[0] for loc in farm_loc],
+            [loc[1] for loc in farm_loc], wd=[float(d)], ws=[speed], site=self.site, types=self.layout_types(Type),
+            heights=list(self.turbine_heights), stop=self.uncertainty_stop)
+        print(f"AEP uncertainty started for {len(farm_loc)} turbines")
+        self.root.after(200, self.poll_aep_uncertainty)
+
+    def poll_aep_uncertainty(self):
+        """Show the Monte Carlo result once it is done."""
+        future = self.uncertainty_future
+        if not future.done():
+            self.root.after(200, self.poll_aep_uncertainty)
+            return
+        self.uncertainty_future = None
+        try:
+            deterministic, summary, history = future.result()
+        except Exception as e:
+            print(f"AEP uncertainty failed: {e}")
+            return
+        for step in history:
+            print(f"{step['samples']} samples: P50 = {step['P50']:.3f} GWh, P90 = {step['P90']:.3f} GWh, "
+                  f"mean 95% CI = [{step['ci_low']:.3f}, {step['ci_high']:.3f}] GWh")
+        text = (f"Deterministic AEP: {deterministic:.3f} GWh\n"
+                f"P50: {summary['P50']:.3f} GWh\nP90: {summary['P90']:.3f} GWh\n"
+                f"Mean: {summary['mean']:.3f} GWh (95% CI {summary['ci_low']:.3f} - {summary['ci_high']:.3f})\n"
+                f"Samples: {summary['samples']}")
+        messagebox.showinfo("AEP Uncertainty", text)
+
+    def export_flow_map(self):
+        """Write the wake map for the current settings to disk tile by tile, as float32 .npy and PNG tiles."""
+        farm_loc = self.convert_to_meters()
+        if not farm_loc:
+            print("Place at least one turbine first.")
+            return
+        directory = filedialog.askdirectory(title="Export Flow Map To")
+        if not directory:
+            return
+        turbine_x = [loc[0] for loc in farm_loc]
+        turbine_y = [loc[1] for loc in farm_loc]
+        ws = float(self.speed_combo.get())
+        wd = float(direction_to_degrees(self.direction_combo.get()))
+        Type, h = self.type_combo.get(), self.h_combo.get()
+        wfm, type_index, hub_heights = make_mixed_wind_farm_model(self.layout_types(Type), self.d_combo.get(),
+                                                                  self.turbine_heights, self.site, h)
+        simulationResult = wfm(turbine_x, turbine_y, h=hub_heights, type=type_index, wd=[wd], ws=[ws])
+        x, y = grid_for_layout(turbine_x, turbine_y)
+        export_flow_map(simulationResult, x, y, wd, ws, npy_path=os.path.join(directory, 'flow_map.npy'),
+                        png_dir=os.path.join(directory, 'tiles'))
+        print(f"Flow map ({len(y)} x {len(x)}) exported to {directory}")
+
+    def run_yaw_optimization(self):
+        """Wake steering yaw table for the current layout over every direction and 4-20 m/s."""
+        farm_loc = self.convert_to_meters()
+        if len(farm_loc) < 2:
+            print("Place at least two turbines first.")
+            return
+        turbine_x = [loc[0] for loc in farm_loc]
+        turbine_y = [loc[1] for loc in farm_loc]
+        wd = [float(direction_to_degrees(direction)) for direction in self.direction_options]
+        ws = np.arange(4.0, 21.0)
+        Type, h = self.type_combo.get(), self.h_combo.get()
+        wfm, type_index, hub_heights = make_mixed_steering_model(self.layout_types(Type), self.d_combo.get(),
+                                                                 self.turbine_heights, self.site, h)
+        table = optimize_yaw(wfm, turbine_x, turbine_y, wd, ws, type_index=type_index, h=hub_heights)
+        gain = table['power_optimized'].sum(axis=1) / table['power_baseline'].sum(axis=1) - 1
+        aep_baseline = float(wfm(turbine_x, turbine_y, h=hub_heights, type=type_index, wd=wd, ws=ws).aep().sum())
+        aep_steered = float(aep_with_yaw(wfm, turbine_x, turbine_y, table, type_index=type_index,
+                                         h=hub_heights).aep().sum())
+        text = "\n".join(f"{direction}: {100 * g:+.2f}% farm power" for direction, g in
+                         zip(self.direction_options, gain))
+        text += f"\nAEP: {aep_baseline:.3f} GWh -> {aep_steered:.3f} GWh"
+        messagebox.showinfo("Yaw Optimization", text)
+        self.yaw_table = table
+        file_path = filedialog.asksaveasfilename(title="Save Yaw Table", defaultextension=".npz",
+                                                 filetypes=(("Yaw Table", "*.npz"),))
+        if file_path:
+            save_yaw_table(file_path, table)
+
+    def load_yaw_table(self):
+        """Use a saved yaw table in Submit Settings runs."""
+        file_path = filedialog.askopenfilename(title="Select Yaw Table", filetypes=(("Yaw Table", "*.npz"),))
+        if file_path:
+            self.yaw_table = load_yaw_table(file_path)
+            print(f"Yaw table loaded from {file_path}")
+
+    def run_wake_loss_breakdown(self):
+        """Wake loss per turbine, sector and wind speed, with each turbine's efficiency drawn on the canvas."""
+        farm_loc = self.convert_to_meters()
+        if not farm_loc:
+            print("Place at least one turbine first.")
+            return
+        turbine_x = [loc[0] for loc in farm_loc]
+        turbine_y = [loc[1] for loc in farm_loc]
+        D = self.d_combo.get()
+        types = self.layout_types(self.type_combo.get())
+        wfm, type_index, hub_heights = make_mixed_wind_farm_model(types, D, self.turbine_heights, self.site,
+                                                                  self.h_combo.get())
+        breakdown = wake_loss_breakdown(wfm, turbine_x, turbine_y, list(dict.fromkeys(types)), D, type_index,
+                                        hub_heights, sparse=len(turbine_x) > SPARSE_MIN_TURBINES)
+
+        self.clear_efficiency_overlay()
+        canvas_x, canvas_y = self.turbine_points.get_data()
+        self.efficiency_artists = draw_efficiency(self.ax, canvas_x, canvas_y, breakdown['efficiency'])
+        self.renderer.request(changed=True)
+
+        gross, net = breakdown['gross'].sum(), breakdown['net'].sum()
+        sectors, ws = breakdown['sectors'], breakdown['ws']
+        half_sector = (sectors[1] - sectors[0]) / 2 if len(sectors) > 1 else 180
+        with np.errstate(invalid='ignore', divide='ignore'):
+            turbine_sector_loss = 1 - breakdown['net'].sum(axis=2) / breakdown['gross'].sum(axis=2)
+        plt.figure(figsize=(12, 5))
+        plt.subplot(1, 2, 1)
+        plt.imshow(100 * farm_loss(breakdown).T, origin='lower', aspect='auto', cmap='Reds',
+                   extent=[sectors[0] - half_sector, sectors[-1] + half_sector, ws[0] - 0.5, ws[-1] + 0.5])
+        plt.colorbar(label='Wake loss [%]')
+        plt.xlabel('Direction sector [deg]')
+        plt.ylabel('Wind speed [m/s]')
+        plt.title(f'Farm wake loss {100 * (1 - net / gross):.1f}% ({gross:.2f} -> {net:.2f} GWh)')
+        plt.subplot(1, 2, 2)
+        plt.imshow(100 * turbine_sector_loss, origin='lower', aspect='auto', cmap='Reds',
+                   extent=[sectors[0] - half_sector, sectors[-1] + half_sector, 0.5, len(turbine_x) + 0.5])
+        plt.colorbar(label='Wake loss [%]')
+        plt.xlabel('Direction sector [deg]')
+        plt.ylabel('Turbine')
+        plt.title('Wake loss per turbine and sector')
+        plt.show()
+
+        file_path = filedialog.asksaveasfilename(title="Save Loss Matrix", defaultextension=".npz",
+                                                 filetypes=(("Loss Matrix", "*.npz"),))
+        if file_path:
+            save_breakdown(file_path, breakdown)
+
+    def clear_efficiency_overlay(self):
+        for artist in self.efficiency_artists:
+            artist.remove()
+        if self.efficiency_artists:
+            self.efficiency_artists = []
+            self.renderer.request(changed=True)
+
     def set_max_turbines(self, value):
         self.max_turbines = int(value)
 
+    def toggle_wake_overlay(self):
+        if self.overlay_var.get():
+            self.direction_sweep.clear()
+        self.wake_overlay.set_enabled(self.overlay_var.get())
+
+    def build_direction_sweep(self):
+        """Render the wake map for every direction at the selected speed, replacing the live overlay."""
+        self.overlay_var.set(False)
+        self.wake_overlay.set_enabled(False)
+        self.direction_sweep.build()
+
+    def toggle_sweep_playback(self):
+        self.direction_sweep.toggle_playback()
+
+    def seek_sweep(self, value):
+        self.direction_sweep.seek(value)
+
+    def toggle_jit_backend(self):
+        """Compute the live overlay with the compiled NOJ kernel instead of PyWake."""
+        if self.jit_var.get():
+            from noj_kernel import JIT_AVAILABLE
+            if not JIT_AVAILABLE:
+                print("Numba is not installed; the live overlay keeps using PyWake.")
+                self.jit_var.set(False)
+                return
+        self.wake_overlay.backend = 'jit' if self.jit_var.get() else 'pywake'
+        self.wake_overlay.schedule()
+
     def run_simulation(self, speed, direction, Type, D, h, farm_loc):
         #given a wind_speed, wind_direction, turbine type, and hub height- return a graph that prints to the window
         
@@ -170,60 +476,270 @@ class WindFarmSimulator:
             turbine_x.append(current_turbine[0])
             turbine_y.append(current_turbine[1])
     
-        if direction == "North":
-            d = 0
-        elif direction == "South":
-            d = 180
-        elif direction == "East":
-            d = 270
-        else:
-            d = 90
-    
-        if Type == "v80 (2)":
-            turbines = V80()
-        elif Type == "iea37 (15)":
-            turbines = IEA37_WindTurbines()
-        if Type == "dtu10mw (10)":
-            turbines = DTU10MW()
-        else:
-            turbines = GenericWindTurbine('User', float(D), float(h), power_norm=10000, turbulence_intensity=.1)
-    
-        site = UniformSite(p_wd=[1], ti=0.1)
-        noj = NOJ(site, turbines)
-    
+        d = direction_to_degrees(direction)
         wd = [float(d)]
         ws = [float(speed)]
-        
-        simulationResult = noj(turbine_x,turbine_y, wd=wd, ws=ws)
+
+        yaw_table = self.yaw_table
+        if (yaw_table is not None and len(turbine_x) == len(yaw_table['x'])
+                and np.allclose(turbine_x, yaw_table['x']) and np.allclose(turbine_y, yaw_table['y'])):
+            # The table only applies to the layout it was optimized for, with the same deflection model
+            wfm, type_index, hub_heights = make_mixed_steering_model(self.layout_types(Type), D,
+                                                                     self.turbine_heights, self.site, h)
+            simulationResult = aep_with_yaw(wfm, turbine_x, turbine_y, yaw_table, wd, ws, type_index, hub_heights)
+        elif len(turbine_x) > SPARSE_MIN_TURBINES:
+            self.run_sparse_simulation(speed, d, Type, D, h, turbine_x, turbine_y)
+            return
+        else:
+            # Every turbine keeps its own type and hub height; mixed farms are still one solve
+            noj, type_index, hub_heights = make_mixed_wind_farm_model(self.layout_types(Type), D,
+                                                                      self.turbine_heights, self.site, h)
+            simulationResult = noj(turbine_x,turbine_y, h=hub_heights, type=type_index, wd=wd, ws=ws)
         
         plt.figure()
         flow_map = simulationResult.flow_map(ws=ws[0], wd=wd[0])
         flow_map.plot_wake_map()
         aep = '%.2fGWh'%(simulationResult.aep().sum())
+        self.last_result = {
+            'flow_map_x': flow_map.x.values,
+            'flow_map_y': flow_map.y.values,
+            'flow_map_ws_eff': flow_map.WS_eff.squeeze().transpose('y', 'x').values,
+            'turbine_power': simulationResult.Power.values.squeeze(),
+            'aep': simulationResult.aep().values.squeeze(),
+        }
         plt.xlabel('x [m]')
         plt.ylabel('y [m]')
         plt.title('Wake map for ' + str(speed) + ' m/s and ' + str(d) + ' degrees, AEP = ' + str(aep))
         plt.show()
 
+    def run_sparse_simulation(self, speed, d, Type, D, h, turbine_x, turbine_y):
+        """Power and AEP of a large layout, solving only turbines that can wake each other together.
+
+        The full wake map would couple every turbine again, so turbines are drawn coloured
+        by power instead.
+        """
+        noj, type_index, hub_heights = make_mixed_wind_farm_model(self.layout_types(Type), D, self.turbine_heights,
+                                                                  self.site, h)
+        wd = float(d)
+        # One exact direction, so the wake cones are not widened by a sector
+        graphs = build_wake_graph(turbine_x, turbine_y, noj.windTurbines.diameter(type_index), [wd], sector_width=0.0)
+        power, aep = sparse_aep(noj, turbine_x, turbine_y, [wd], [float(speed)], [wd], graphs,
+                                type_index=type_index, h=hub_heights)
+        self.last_result = {'turbine_power': power[:, 0, 0], 'aep': aep}
+
+        plt.figure()
+        points = plt.scatter(turbine_x, turbine_y, c=power[:, 0, 0] / 1000, s=12, cmap='viridis')
+        plt.colorbar(points, label='Power [kW]')
+        plt.gca().set_aspect('equal')
+        plt.xlabel('x [m]')
+        plt.ylabel('y [m]')
+        plt.title(f'Turbine power for {speed} m/s and {d} degrees, AEP = {aep.sum():.2f}GWh')
+        plt.show()
+
     def load_map(self):
         file_path = filedialog.askopenfilename(
             title="Select Map Image",
             filetypes=(("Image Files", "*.png;*.jpg;*.jpeg;*.bmp"), ("All Files", "*.*")),
         )
         if file_path:
-            self.map_image = plt.imread(file_path)
-            height, width, _ = self.map_image.shape
-            self.map_aspect_ratio = width / height
-            self.ax.imshow(
-                self.map_image, extent=[0, 100, 0, 100], aspect='auto', origin='upper'
-            )
-            self.canvas.draw()
+            self.show_map(file_path)
+
+    def show_map(self, file_path):
+        self.map_image = plt.imread(file_path)
+        self.map_path = file_path
+        height, width, _ = self.map_image.shape
+        self.map_aspect_ratio = width / height
+        self.ax.imshow(
+            self.map_image, extent=[0, 100, 0, 100], aspect='auto', origin='upper'
+        )
+        self.canvas.draw()
+
+    def load_wind_resource(self):
+        """Use a site fitted from SCADA by Validation/wind_resource.py instead of the uniform site."""
+        file_path = filedialog.askopenfilename(
+            title="Select Wind Resource",
+            filetypes=(("Wind Resource", "*.npz"), ("All Files", "*.*")),
+        )
+        if file_path:
+            try:
+                self.site = load_site(file_path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Could not load wind resource {file_path}: {e}")
+                return
+            self.site_path = file_path
+            print(f"Wind resource loaded from {file_path}")
+            self.wake_overlay.schedule()
+
+    def save_session(self):
+        """Save the layout, scale, settings, file references and cached results to one .npz file."""
+        file_path = filedialog.asksaveasfilename(
+            title="Save Session", defaultextension=".npz", filetypes=(("Session", "*.npz"),),
+        )
+        if not file_path:
+            return
+        manifest = {
+            'pixel_to_real_ratio': self.pixel_to_real_ratio,
+            'max_turbines': self.max_turbines,
+            'map_path': self.map_path,
+            'site_path': self.site_path,
+            'settings': {
+                'speed': self.speed_combo.get(), 'direction': self.direction_combo.get(),
+                'type': self.type_combo.get(), 'diameter': self.d_combo.get(), 'hub_height': self.h_combo.get(),
+            },
+            'overlay_enabled': self.overlay_var.get(),
+            'overlay_extent': self.wake_overlay.extent,
+            'xlim': list(self.ax.get_xlim()),
+            'ylim': list(self.ax.get_ylim()),
+        }
+        arrays = {
+            'turbines': np.array(self.coordinates, dtype=float).reshape(-1, 2),
+            'turbine_canvas': np.column_stack(self.turbine_points.get_data()).astype(float).reshape(-1, 2),
+            'turbine_types': np.array(self.turbine_types, dtype=str),
+            'turbine_heights': np.array(self.turbine_heights, dtype=float),
+        }
+        if self.wake_overlay.field is not None:
+            arrays['overlay_field'] = self.wake_overlay.field
+        arrays.update({'result_' + name: self.last_result[name] for name in self.last_result.keys()})
+        if self.session is not None:
+            # Results are in memory now; release the old file so it can be overwritten
+            self.last_result = {name: arrays['result_' + name] for name in self.last_result.keys()}
+            self.session.close()
+            self.session = None
+        save_session(file_path, manifest, arrays)
+        print(f"Session saved to {file_path}")
+
+    def load_session(self):
+        """Restore a saved session; cached simulation results are only read when used."""
+        file_path = filedialog.askopenfilename(
+            title="Load Session", filetypes=(("Session", "*.npz"), ("All Files", "*.*")),
+        )
+        if not file_path:
+            return
+        session = Session(file_path)
+        manifest = session.manifest
+        if self.session is not None:
+            self.session.close()
+        self.session = session
+        # Nothing drawn for the previous layout may survive into the restored one
+        self.wake_overlay.clear()
+        self.direction_sweep.clear()
+
+        while self.plotted_points:
+            self.plotted_points.pop().remove()
+        self.pixel_to_real_ratio = manifest['pixel_to_real_ratio']
+        turbines = session['turbines']
+        if 'turbine_canvas' in session:
+            self.set_turbines(turbines, session['turbine_canvas'], session['turbine_types'],
+                              session['turbine_heights'])
+        else:
+            # Sessions saved before per-turbine types were tracked
+            self.set_turbines(turbines, turbines / self.pixel_to_real_ratio, [manifest['settings']['type']] * len(turbines),
+                              [float('nan')] * len(turbines))
+        self.max_turbines = max(manifest['max_turbines'], len(turbines))
+        self.turbine_slider.configure(to=max(100, self.max_turbines))
+        self.turbine_slider.set(self.max_turbines)
+        settings = manifest['settings']
+        self.speed_combo.set(settings['speed'])
+        self.direction_combo.set(settings['direction'])
+        self.type_combo.set(settings['type'])
+        self.d_combo.set(settings['diameter'])
+        self.h_combo.set(settings['hub_height'])
+        if manifest['map_path'] and manifest['map_path'] != self.map_path:
+            try:
+                self.show_map(manifest['map_path'])
+            except OSError as e:
+                print(f"Could not reload map {manifest['map_path']}: {e}")
+        if manifest['site_path']:
+            try:
+                self.site = load_site(manifest['site_path'])
+                self.site_path = manifest['site_path']
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Could not reload wind resource {manifest['site_path']}: {e}")
+
+        self.ax.set_xlim(manifest['xlim'])
+        self.ax.set_ylim(manifest['ylim'])
+        self.last_result = session.arrays('result_')
+
+        self.overlay_var.set(manifest['overlay_enabled'])
+        self.wake_overlay.enabled = manifest['overlay_enabled']
+        self.wake_overlay.generation += 1
+        if manifest['overlay_enabled'] and 'overlay_field' in session:
+            self.wake_overlay.show(session['overlay_field'], manifest['overlay_extent'])
+        elif manifest['overlay_enabled']:
+            # Saved before the overlay had finished; compute it for the restored layout
+            self.wake_overlay.schedule()
+        self.renderer.request(changed=True)
+        print(f"Session loaded from {file_path}: {len(self.coordinates)} turbines")
+
+    def set_turbines(self, coordinates, canvas_xy, types, heights):
+        """Replace every turbine at once; coordinates in feet, canvas_xy in canvas units, both (n, 2)."""
+        self.coordinates = [tuple(xy) for xy in np.asarray(coordinates, dtype=float).reshape(-1, 2).tolist()]
+        self.turbine_types = np.asarray(types, dtype=str).tolist()
+        self.turbine_heights = np.asarray(heights, dtype=float).tolist()
+        canvas_xy = np.asarray(canvas_xy, dtype=float).reshape(-1, 2)
+        self.turbine_points.set_data(canvas_xy[:, 0], canvas_xy[:, 1])
+        # Efficiencies belong to the old layout
+        self.clear_efficiency_overlay()
+
+    def layout_types(self, default):
+        """Turbine type per turbine, with default for turbines that follow the type dropdown.
+
+        Turbines placed on the canvas have no type of their own, so changing the dropdown
+        re-types them; imported layouts keep the types in the file.
+        """
+        return [t or default for t in self.turbine_types]
+
+    def import_layout(self):
+        """Load turbine positions (meters), types and hub heights from CSV, GeoJSON or npz onto the canvas."""
+        file_path = filedialog.askopenfilename(
+            title="Import Layout",
+            filetypes=(("Layouts", "*.csv;*.geojson;*.json;*.npz"), ("All Files", "*.*")),
+        )
+        if not file_path:
+            return
+        x, y, types, heights = load_layout(file_path)
+        feet = np.column_stack([x, y]) / FEET_TO_METERS
+        self.set_turbines(feet, feet / self.pixel_to_real_ratio, types, heights)
+        if len(x) > self.max_turbines:
+            self.turbine_slider.configure(to=max(100, len(x)))
+            self.turbine_slider.set(len(x))
+        if len(set(self.turbine_types)) == 1 and self.turbine_types[0] in self.type_options:
+            self.type_combo.set(self.turbine_types[0])
+        self.renderer.request(changed=True)
+        self.wake_overlay.schedule()
+        print(f"Imported {len(x)} turbines from {file_path}")
+
+    def export_layout(self):
+        """Save turbine positions (meters), types and hub heights as CSV, GeoJSON, local JSON or npz."""
+        file_path = filedialog.asksaveasfilename(
+            title="Export Layout", defaultextension=".csv",
+            filetypes=(("CSV", "*.csv"), ("GeoJSON", "*.geojson"), ("Local JSON", "*.json"), ("NumPy", "*.npz")),
+        )
+        if not file_path:
+            return
+        origin = None
+        if file_path.lower().endswith('.geojson'):
+            # GeoJSON is longitude/latitude, so the canvas origin has to be placed on the map
+            answer = simpledialog.askstring("Layout Origin", "Longitude, latitude of the canvas origin (x = y = 0):")
+            if not answer:
+                return
+            try:
+                origin = tuple(float(value) for value in answer.split(','))
+            except ValueError:
+                origin = ()
+            if len(origin) != 2:
+                messagebox.showerror("Layout Origin", "Enter the longitude and latitude separated by a comma.")
+                return
+        meters = np.array(self.coordinates, dtype=float).reshape(-1, 2) * FEET_TO_METERS
+        # Turbines that follow the dropdowns are written with the selected type; a NaN height keeps the default
+        save_layout(file_path, meters[:, 0], meters[:, 1], self.layout_types(self.type_combo.get()),
+                    self.turbine_heights, origin)
+        print(f"Exported {len(meters)} turbines to {file_path}")
 
     def convert_to_meters(self):
         """Converts turbine locations to meters and displays the array."""
-        conversion_factor = 0.3048
         coordinates_in_meters = [
-            (x * conversion_factor, y * conversion_factor) for x, y in self.coordinates
+            (x * FEET_TO_METERS, y * FEET_TO_METERS) for x, y in self.coordinates
         ]
         print("Turbine locations in meters:", coordinates_in_meters)
         return coordinates_in_meters
@@ -264,19 +780,29 @@ class WindFarmSimulator:
             self.canvas.mpl_disconnect(self.cid)
             self.scale_mode = False
 
+    def view_state(self):
+        """Everything that affects what the canvas shows, used to skip redundant redraws."""
+        return (self.ax.get_xlim(), self.ax.get_ylim(), self.ax.get_aspect(), self.canvas_size,
+                len(self.ax.lines), len(self.ax.images))
+
     def on_resize(self, event):
         """Maintain the aspect ratio of the map on window resize."""
+        # <Configure> fires for every child widget and for moves; only canvas size changes matter
+        if event.widget is not self.canvas_widget or (event.width, event.height) == self.canvas_size:
+            return
+        self.canvas_size = (event.width, event.height)
         if self.map_image is not None:
-            width = self.canvas_widget.winfo_width()
-            height = self.canvas_widget.winfo_height()
+            width, height = self.canvas_size
             if width / height > self.map_aspect_ratio:
                 self.ax.set_aspect(1 / self.map_aspect_ratio, adjustable='datalim')
             else:
                 self.ax.set_aspect(self.map_aspect_ratio, adjustable='datalim')
-            self.canvas.draw()
+            self.renderer.request()
 
     def on_key_press(self, event):
         """Pan the canvas with WASD keys."""
+        if event.keysym not in ('w', 'a', 's', 'd'):
+            return
         step = 5
         xlim = self.ax.get_xlim()
         ylim = self.ax.get_ylim()
@@ -288,7 +814,8 @@ class WindFarmSimulator:
             self.ax.set_xlim(xlim[0] - step, xlim[1] - step)
         elif event.keysym == 'd':
             self.ax.set_xlim(xlim[0] + step, xlim[1] + step)
-        self.canvas.draw()
+        self.renderer.request()
+        self.wake_overlay.schedule()
 
     def on_click(self, event):
         if event.xdata is None or event.ydata is None or self.scale_mode:
@@ -298,15 +825,24 @@ class WindFarmSimulator:
                 real_x = event.xdata * self.pixel_to_real_ratio
                 real_y = event.ydata * self.pixel_to_real_ratio
                 self.coordinates.append((real_x, real_y))
-                point, = self.ax.plot(event.xdata, event.ydata, 'ro')
-                self.plotted_points.append(point)
-                self.canvas.draw()
+                # Placed turbines follow the type and hub height dropdowns until a layout file sets them
+                self.turbine_types.append('')
+                self.turbine_heights.append(float('nan'))
+                xs, ys = self.turbine_points.get_data()
+                self.turbine_points.set_data(np.append(xs, event.xdata), np.append(ys, event.ydata))
+                self.clear_efficiency_overlay()
+                self.renderer.request(changed=True)
+                self.wake_overlay.schedule()
         elif event.button == 3:
-            if self.coordinates and self.plotted_points:
+            if self.coordinates:
                 self.coordinates.pop()
-                last_point = self.plotted_points.pop()
-                last_point.remove()
-                self.canvas.draw()
+                self.turbine_types.pop()
+                self.turbine_heights.pop()
+                xs, ys = self.turbine_points.get_data()
+                self.turbine_points.set_data(xs[:-1], ys[:-1])
+                self.clear_efficiency_overlay()
+                self.renderer.request(changed=True)
+                self.wake_overlay.schedule()
 
     def on_scroll(self, event):
         if event.xdata is None or event.ydata is None:
@@ -327,10 +863,19 @@ class WindFarmSimulator:
         ]
         self.ax.set_xlim(new_xlim)
         self.ax.set_ylim(new_ylim)
-        self.canvas.draw()
+        self.renderer.request()
+        self.wake_overlay.schedule()
 
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Wind Farm Simulation")
+    parser.add_argument('--record-events', metavar='PATH',
+                        help='record canvas interactions for benchmarks/interaction_replay.py')
+    args = parser.parse_args()
     root = tk.Tk()
     app = WindFarmSimulator(root)
+    if args.record_events:
+        from interaction_recorder import EventRecorder
+        app.recorder = EventRecorder(app, args.record_events)
     root.mainloop()
@@ -0,0 +1,162 @@
+'''
+Simul8ors
+
+Replays a recorded interaction stream (see interaction_recorder.py) against
+WindFarmSimulator and reports, per event type:
+- handler_ms: time spent in on_resize / on_key_press / on_click / on_scroll
+- render_ms:  time of the redraw the event requested, rendered with Agg (0 when the
+              render scheduler skipped it)
+
+The window is never shown and the Tk event loop never runs. Each event is handed
+straight to its handler, and the render it requested is flushed right away. The
+canvas is drawn by a plain Agg canvas, so only matplotlib's rendering is timed, not
+the blit to the screen. The live wake overlay is switched off, since it computes in
+another process. Tk still needs a display, so use xvfb-run on a headless machine.
+
+Record a session, then replay it from the repository root:
+    python WindFarmSimulator.py --record-events session.jsonl
+    python benchmarks/interaction_replay.py session.jsonl --budget 20 --record benchmarks/interaction_history.jsonl
+The script exits with status 1 when the p95 of handler plus render time exceeds --budget (ms).
+'''
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import matplotlib  # noqa: E402
+matplotlib.use('Agg')
+
+import numpy as np  # noqa: E402
+import tkinter as tk  # noqa: E402
+from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: E402
+
+from WindFarmSimulator import WindFarmSimulator  # noqa: E402
+from interaction_recorder import read_events  # noqa: E402
+
+HANDLERS = {'resize': 'on_resize', 'key': 'on_key_press', 'click': 'on_click', 'scroll': 'on_scroll'}
+
+
+def make_app():
+    """A hidden simulator whose renders go to an Agg canvas."""
+    root = tk.Tk()
+    root.withdraw()
+    app = WindFarmSimulator(root)
+    app.wake_overlay.set_enabled(False)
+    app.renderer.render = FigureCanvasAgg(app.fig).draw
+    return app
+
+
+def apply_state(app, state):
+    if state['map_path'] and state['map_path'] != app.map_path:
+        app.show_map(state['map_path'])
+    for combo, value in zip((app.speed_combo, app.direction_combo, app.type_combo, app.d_combo, app.h_combo),
+                            state['settings']):
+        combo.set(value)
+    app.max_turbines = state['max_turbines']
+    app.pixel_to_real_ratio = state['pixel_to_real_ratio']
+    app.scale_mode = state['scale_mode']
+
+
+def make_event(app, line):
+    if line['kind'] == 'resize':
+        return SimpleNamespace(widget=app.canvas_widget, width=line['width'], height=line['height'])
+    if line['kind'] == 'key':
+        return SimpleNamespace(widget=app.root, keysym=line['keysym'])
+    return SimpleNamespace(xdata=line['xdata'], ydata=line['ydata'], button=line['button'])
+
+
+def flush_render(app):
+    """Run the render the last event requested now; returns its time in seconds."""
+    renderer = app.renderer
+    if renderer.after_id is None:
+        return 0.0
+    app.root.after_cancel(renderer.after_id)
+    start = time.perf_counter()
+    renderer.flush()
+    return time.perf_counter() - start
+
+
+def replay(app, lines):
+    """Handler and render time (seconds) for every recorded interaction, in order."""
+    timings = []
+    for line in lines:
+        if line['kind'] == 'state':
+            apply_state(app, line)
+            continue
+        handler = getattr(app, HANDLERS[line['kind']])
+        event = make_event(app, line)
+        start = time.perf_counter()
+        handler(event)
+        handler_s = time.perf_counter() - start
+        # Overlay requests are not part of the measurement
+        if app.wake_overlay.after_id is not None:
+            app.root.after_cancel(app.wake_overlay.after_id)
+            app.wake_overlay.after_id = None
+        timings.append((line['kind'], handler_s, flush_render(app)))
+    return timings
+
+
+def summarize(timings):
+    """Per event type and overall: count, median/p95/max handler ms and median/p95 render ms."""
+    summary = {}
+    for kind in list(HANDLERS) + ['all']:
+        rows = [(handler, render) for k, handler, render in timings if kind in (k, 'all')]
+        if not rows:
+            continue
+        handler_ms = np.array([row[0] for row in rows]) * 1000
+        render_ms = np.array([row[1] for row in rows]) * 1000
+        summary[kind] = {
+            'events': len(rows),
+            'handler_median_ms': float(np.median(handler_ms)),
+            'handler_p95_ms': float(np.percentile(handler_ms, 95)),
+            'handler_max_ms': float(handler_ms.max()),
+            'render_median_ms': float(np.median(render_ms)),
+            'render_p95_ms': float(np.percentile(render_ms, 95)),
+            'total_p95_ms': float(np.percentile(handler_ms + render_ms, 95)),
+        }
+    return summary
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('events', help='file written by WindFarmSimulator.py --record-events')
+    parser.add_argument('--budget', type=float, default=None, help='maximum p95 handler + render time in ms')
+    parser.add_argument('--record', default=None, help='append the summary to this JSON lines file')
+    args = parser.parse_args()
+
+    app = make_app()
+    timings = replay(app, read_events(args.events))
+    app.root.destroy()
+    summary = summarize(timings)
+    for kind, stats in summary.items():
+        print(f"{kind:>6}: {stats['events']} events, handler median {stats['handler_median_ms']:.2f} ms, "
+              f"p95 {stats['handler_p95_ms']:.2f} ms, max {stats['handler_max_ms']:.2f} ms; "
+              f"render median {stats['render_median_ms']:.2f} ms, p95 {stats['render_p95_ms']:.2f} ms")
+    print(f"renders: {app.renderer.renders}, skipped: {app.renderer.skipped}")
+
+    if args.record:
+        with open(args.record, 'a') as f:
+            f.write(json.dumps(dict(summary, events_file=os.path.basename(args.events), revision=git_revision(),
+                                    time=time.strftime('%Y-%m-%dT%H:%M:%S'))) + '\n')
+    if args.budget is not None and summary and summary['all']['total_p95_ms'] > args.budget:
+        print(f"Interaction budget exceeded: p95 {summary['all']['total_p95_ms']:.2f} ms > {args.budget:.2f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
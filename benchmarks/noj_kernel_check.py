@@ -0,0 +1,77 @@
+'''
+Simul8ors
+
+Checks the compiled NOJ kernel (noj_kernel.py) against PyWake's NOJ and times both.
+Random layouts are solved for every dropdown turbine type and direction. The script
+reports the largest relative turbine power difference, the largest flow map
+difference, and the median solve time of each. Run from the repository root:
+    python benchmarks/noj_kernel_check.py --turbines 50 200 --tolerance 0.01
+The script exits with status 1 when a power difference exceeds --tolerance (relative
+to the largest turbine power) or Numba is not installed.
+'''
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from farm_model import make_wind_farm_model  # noqa: E402
+from noj_kernel import JIT_AVAILABLE, check_against_pywake, get_kernel  # noqa: E402
+
+TYPES = [("v80 (2)", None, None), ("iea37 (15)", None, None), ("dtu10mw (10)", None, None),
+         ("Generic (10)", 100, 110)]
+
+
+def median_time(function, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turbines', type=int, nargs='+', default=[20, 100, 300])
+    parser.add_argument('--ws', type=float, default=10.0)
+    parser.add_argument('--tolerance', type=float, default=0.01)
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if not JIT_AVAILABLE:
+        print("Numba is not installed")
+        sys.exit(1)
+
+    rng = np.random.default_rng(args.seed)
+    failed = False
+    for Type, D, h in TYPES:
+        kernel = get_kernel(Type, D, h)
+        wfm = make_wind_farm_model(Type, D, h)
+        spacing = 5 * 2 * kernel.radius
+        for n in args.turbines:
+            side = np.sqrt(n) * spacing
+            x, y = rng.uniform(0, side, n), rng.uniform(0, side, n)
+            grid_x = np.linspace(-spacing, side + spacing, 60)
+            grid_y = np.linspace(-spacing, side + spacing, 60)
+            for wd in (0.0, 90.0, 180.0, 270.0):
+                power_error, field_error = check_against_pywake(Type, D, h, x, y, wd, args.ws, grid_x, grid_y)
+                failed |= power_error > args.tolerance
+                print(f"{Type:>13} {n:>4} turbines wd {wd:>5.0f}: power difference {power_error:.2e}, "
+                      f"flow map difference {field_error:.3f} m/s")
+            kernel_s = median_time(lambda: kernel.solve(x, y, 270.0, args.ws), args.repeats)
+            pywake_s = median_time(lambda: wfm(x, y, wd=[270.0], ws=[args.ws]), max(1, args.repeats // 5))
+            print(f"{Type:>13} {n:>4} turbines: kernel {1000 * kernel_s:.3f} ms, PyWake {1000 * pywake_s:.1f} ms")
+    if failed:
+        print(f"Power difference above tolerance {args.tolerance}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+'''
+Simul8ors
+
+Startup benchmark for WindFarmSimulator. Each run starts a fresh interpreter and
+measures, from the start of the process:
+- import_s: WindFarmSimulator imported
+- window_s: window built and drawn (what the user waits for)
+- ready_s:  background warm-up finished (PyWake imported, first solve done)
+
+Needs a display (use xvfb-run on a headless machine). Run from the repository root:
+    python benchmarks/startup_benchmark.py --runs 5 --budget 1.5 --record benchmarks/startup_history.jsonl
+The script exits with status 1 when the median window_s exceeds --budget.
+'''
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RUN_ONCE = '''
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import tkinter as tk
+import WindFarmSimulator
+imported = time.perf_counter()
+root = tk.Tk()
+app = WindFarmSimulator.WindFarmSimulator(root)
+root.update()
+shown = time.perf_counter()
+while not app.warm_up_done.is_set():
+    root.update()
+    time.sleep(0.005)
+ready = time.perf_counter()
+root.destroy()
+print(json.dumps({{'import_s': imported - start, 'window_s': shown - start, 'ready_s': ready - start}}))
+'''
+
+
+def run_once():
+    """Time one cold start in a fresh interpreter; interpreter startup is included."""
+    launched = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', RUN_ONCE.format(root=ROOT)], cwd=ROOT,
+                            capture_output=True, text=True, check=True).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    total = time.perf_counter() - launched
+    # Shift the in-process times so they count from process launch
+    offset = total - timings['ready_s']
+    return {name: value + offset for name, value in timings.items()}
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=None, help='maximum median window_s in seconds')
+    parser.add_argument('--record', default=None, help='append the medians to this JSON lines file')
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    medians = {name: statistics.median(run[name] for run in runs) for name in runs[0]}
+    for name, value in medians.items():
+        print(f"{name}: {value:.3f} s (median of {args.runs})")
+
+    if args.record:
+        with open(args.record, 'a') as f:
+            f.write(json.dumps(dict(medians, revision=git_revision(), time=time.strftime('%Y-%m-%dT%H:%M:%S'),
+                                    runs=args.runs)) + '\n')
+    if args.budget is not None and medians['window_s'] > args.budget:
+        print(f"Startup budget exceeded: window_s {medians['window_s']:.3f} s > {args.budget:.3f} s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+'''
+Simul8ors
+
+Accuracy and performance budget for the two validations. Both are rerun on a fixed
+Kelmarsh window, each in a fresh interpreter, and every metric is checked against a
+stored budget:
+- wake:        Wake_Model_Validation on the farm (Jensen_1983, fitted site), farm power
+               MAE/RMSE in kW and the relative AEP error over the window
+- power_curve: Simulation_Validation on turbine 1 (Senvion curve), MAE/RMSE in kW and
+               the relative error of the power curve AEP against the measured AEP
+plus wall_s (wall time) and peak_mb (peak memory) for each. Every metric is "lower is
+better", so a speed-up that costs accuracy fails just like a slowdown does.
+
+The wake run goes through the validation's own loader (model_comparison.load_farm_data).
+Needs the Kelmarsh data in Kelmarsh_SCADA_2021_3087 at the repository root, or pass
+--data. Run from the repository root:
+    python benchmarks/validation_benchmark.py --update-budget     (store the current run as budget)
+    python benchmarks/validation_benchmark.py --record benchmarks/validation_history.jsonl
+The script exits with status 1 when any metric exceeds its budget.
+'''
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VALIDATION = os.path.join(ROOT, 'Validation')
+DATA = os.path.join(ROOT, 'Kelmarsh_SCADA_2021_3087')
+BUDGET = os.path.join(ROOT, 'benchmarks', 'validation_budget.json')
+VALIDATIONS = ('wake', 'power_curve')
+
+# The fixed subset: the first two weeks of the 2021 files
+START = '2021-01-01'
+END = '2021-01-15'
+
+# Headroom added to a measured run when it is stored as the budget
+ACCURACY_MARGIN = 0.02
+TIME_MARGIN = 0.25
+MEMORY_MARGIN = 0.25
+
+def read_window(file, columns, start=START, end=END):
+    import pandas as pd
+    data = pd.read_csv(file, skiprows=9, index_col='# Date and time', parse_dates=True)
+    return data.loc[(data.index >= start) & (data.index < end), columns]
+
+
+def errors(observed, predicted):
+    import numpy as np
+    difference = np.asarray(observed, dtype=float) - np.asarray(predicted, dtype=float)
+    return float(np.mean(np.abs(difference))), float(np.sqrt(np.mean(difference ** 2)))
+
+
+def run_wake(data_dir):
+    """Farm power MAE/RMSE and relative AEP error of the wake model over the window."""
+    from py_wake.literature.noj import Jensen_1983
+    from condition_binning import simulate_binned
+    from model_comparison import load_farm_data
+    from power_curves import senvion_turbine
+    from wind_resource import load_site
+
+    # The validation's own loader, filters and layout, restricted to the window
+    arrays, timestamps, file_list, _ = load_farm_data(data_dir, START, END)
+    turbine = senvion_turbine(hub_height=78.5)
+    # A fresh cache, so the site fit is part of every measured run
+    with tempfile.TemporaryDirectory() as cache_dir:
+        site = load_site(file_list, cache_dir=cache_dir)
+    wake_model = Jensen_1983(site, turbine)
+    observed = arrays['observed']
+    # Same condition binning as Wake_Model_Validation, so its error counts against the accuracy budget
+    predicted = simulate_binned(wake_model, arrays['x'], arrays['y'], arrays['h'], arrays['wd'], arrays['ws'],
+                                available=arrays['available'], ws_step=0.5, wd_step=2.0,
+                                error_samples=0)[0].sum(axis=1)
+    mae, rmse = errors(observed, predicted)
+    aep_error = abs(predicted.mean() - observed.mean()) / observed.mean()
+    return {'timestamps': len(timestamps), 'mae_kw': mae, 'rmse_kw': rmse, 'aep_error': float(aep_error)}
+
+
+def run_power_curve(data_dir):
+    """Turbine 1 power curve MAE/RMSE and relative AEP error against measured energy."""
+    import numpy as np
+    from data_quality import nan_filter, range_filter, stuck_filter, curtailment_filter, status_filter, run_filters
+    from energy_aggregation import reduce_series, summarize
+    from power_curves import SENVION_POWER, SENVION_WS
+
+    files = glob.glob(os.path.join(data_dir, 'Turbine_Data_Kelmarsh_1_2021-01-01_-_2021-07-01_*.csv'))
+    status_files = glob.glob(os.path.join(data_dir, 'Status_Kelmarsh_1_2021-01-01_-_2021-07-01_*.csv'))
+    if not files or not status_files:
+        raise FileNotFoundError(f"No Kelmarsh turbine 1 data or status file in {data_dir}")
+    file, status_file = files[0], status_files[0]
+    raw = read_window(file, ['Wind speed (m/s)', 'Power (kW)'])
+
+    # Measured AEP uses every row, as in Simulation_Validation; missing power counts as a gap
+    energy = summarize(reduce_series(1, [(raw.index.to_numpy(), raw['Power (kW)'].to_numpy(dtype=float))],
+                                     status_file), rated_power_kw=2050)
+    aep_real = float(energy['aep_gwh'].iloc[0])
+
+    measured_data = raw
+    keep, _ = run_filters(measured_data, [
+        ('missing values', nan_filter(['Wind speed (m/s)', 'Power (kW)'])),
+        ('status', status_filter(status_file)),
+        ('wind speed range', range_filter('Wind speed (m/s)', 0, 40)),
+        ('stuck wind speed', stuck_filter('Wind speed (m/s)')),
+        ('curtailment', curtailment_filter('Wind speed (m/s)', 'Power (kW)', SENVION_WS, SENVION_POWER)),
+    ])
+    turbine_data = measured_data[keep]
+    predicted = np.interp(turbine_data['Wind speed (m/s)'], SENVION_WS, SENVION_POWER)
+    mae, rmse = errors(turbine_data['Power (kW)'], predicted)
+
+    wind_speed_hist, _ = np.histogram(turbine_data['Wind speed (m/s)'], bins=SENVION_WS, density=True)
+    aep_model = float(sum(wind_speed_hist * SENVION_POWER[:-1]) * 8760 / 1e6)
+    return {'timestamps': int(keep.sum()), 'mae_kw': mae, 'rmse_kw': rmse,
+            'aep_error': abs(aep_model - aep_real) / aep_real}
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process, from the OS where available."""
+    try:
+        import resource
+    except ImportError:
+        import tracemalloc
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def run_child(name, data_dir):
+    """Run one validation in this process and print its metrics as JSON."""
+    try:
+        import resource  # noqa: F401
+    except ImportError:
+        # No OS peak (Windows): trace Python allocations instead, which also covers NumPy
+        import tracemalloc
+        tracemalloc.start()
+    sys.path.insert(0, VALIDATION)
+    start = time.perf_counter()
+    metrics = {'wake': run_wake, 'power_curve': run_power_curve}[name](data_dir)
+    metrics['wall_s'] = time.perf_counter() - start
+    metrics['peak_mb'] = peak_memory_mb()
+    print(json.dumps(metrics))
+
+
+def run_validation(name, data_dir):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', name, '--data', data_dir], cwd=ROOT,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def budget_from(results):
+    """A budget with headroom over a measured run."""
+    margins = {'mae_kw': ACCURACY_MARGIN, 'rmse_kw': ACCURACY_MARGIN, 'aep_error': ACCURACY_MARGIN,
+               'wall_s': TIME_MARGIN, 'peak_mb': MEMORY_MARGIN}
+    return {name: {metric: metrics[metric] * (1 + margin) for metric, margin in margins.items()}
+            for name, metrics in results.items()}
+
+
+def over_budget(results, budget):
+    """(validation, metric, value, limit) for every metric above its budget."""
+    return [(name, metric, results[name][metric], limit)
+            for name, limits in budget.items() if name in results
+            for metric, limit in limits.items() if results[name][metric] > limit]
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--child', choices=VALIDATIONS, help=argparse.SUPPRESS)
+    parser.add_argument('--data', default=DATA, help='folder with the Kelmarsh SCADA and status files')
+    parser.add_argument('--only', choices=VALIDATIONS, action='append', help='run only these validations')
+    parser.add_argument('--budget', default=BUDGET, help='budget JSON file')
+    parser.add_argument('--update-budget', action='store_true', help='store this run (plus headroom) as budget')
+    parser.add_argument('--record', default=None, help='append the results to this JSON lines file')
+    args = parser.parse_args()
+    data_dir = os.path.abspath(args.data)
+    if args.child:
+        run_child(args.child, data_dir)
+        return
+    if not os.path.isdir(data_dir):
+        print(f"No Kelmarsh data at {data_dir}; pass --data")
+        sys.exit(2)
+
+    results = {name: run_validation(name, data_dir) for name in args.only or VALIDATIONS}
+    for name, metrics in results.items():
+        print(f"{name}: " + ", ".join(f"{metric} {value:.4g}" for metric, value in metrics.items()))
+
+    if args.record:
+        with open(args.record, 'a') as f:
+            f.write(json.dumps(dict(results, revision=git_revision(), time=time.strftime('%Y-%m-%dT%H:%M:%S'),
+                                    window=[START, END])) + '\n')
+    if args.update_budget:
+        budget = {}
+        if os.path.exists(args.budget):
+            with open(args.budget) as f:
+                budget = json.load(f)
+        budget.update(budget_from(results))
+        with open(args.budget, 'w') as f:
+            json.dump(budget, f, indent=2)
+        print(f"Budget written to {args.budget}")
+        return
+    if not os.path.exists(args.budget):
+        print(f"No budget at {args.budget}; run with --update-budget first")
+        sys.exit(2)
+    with open(args.budget) as f:
+        budget = json.load(f)
+    failures = over_budget(results, budget)
+    for name, metric, value, limit in failures:
+        print(f"Budget exceeded: {name} {metric} {value:.4g} > {limit:.4g}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
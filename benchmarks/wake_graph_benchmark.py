@@ -0,0 +1,65 @@
+'''
+Simul8ors
+
+Scaling benchmark for the sparse wake solve (wake_graph.py) against a single
+all-to-all PyWake call. Regular grid layouts with 7 D spacing and growing turbine
+counts are solved for one direction and speed. The script reports time per turbine
+for both solves and the largest relative difference in turbine power. For a
+direction along a grid axis, the rows cannot wake each other, so the script checks
+that no wake cluster is larger than one row. Run from the repository root:
+    python benchmarks/wake_graph_benchmark.py --sizes 100 400 1600 --wd 270
+'''
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from farm_model import make_wind_farm_model  # noqa: E402
+from wake_graph import build_wake_graph, sparse_power, wake_clusters  # noqa: E402
+
+
+def grid_layout(n, spacing):
+    side = int(np.ceil(np.sqrt(n)))
+    x, y = np.meshgrid(np.arange(side) * spacing, np.arange(side) * spacing)
+    return x.ravel()[:n], y.ravel()[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 400, 1600])
+    parser.add_argument('--wd', type=float, default=270.0)
+    parser.add_argument('--ws', type=float, default=10.0)
+    parser.add_argument('--skip-full-above', type=int, default=2000, help='largest layout solved all-to-all')
+    args = parser.parse_args()
+
+    wfm = make_wind_farm_model("v80 (2)", None, None)
+    diameter = wfm.windTurbines.diameter()
+    for n in args.sizes:
+        x, y = grid_layout(n, 7 * diameter)
+        start = time.perf_counter()
+        graphs = build_wake_graph(x, y, diameter, [args.wd])
+        power = sparse_power(wfm, x, y, [args.wd], [args.ws], [args.wd], graphs)[:, 0, 0]
+        sparse_s = time.perf_counter() - start
+        largest = np.bincount(wake_clusters(graphs[0])).max()
+        if args.wd % 90 == 0:
+            side = int(np.ceil(np.sqrt(n)))
+            assert largest <= side, f"{largest} turbines in one wake cluster; rows of {side} should be independent"
+        line = (f"{n:>6} turbines: {graphs[0].nnz} wake pairs, largest cluster {largest}, sparse {sparse_s:.2f} s "
+                f"({1000 * sparse_s / n:.2f} ms/turbine)")
+        if n <= args.skip_full_above:
+            start = time.perf_counter()
+            full = wfm(x, y, wd=[args.wd], ws=[args.ws]).Power.values[:, 0, 0]
+            full_s = time.perf_counter() - start
+            difference = np.max(np.abs(power - full) / np.maximum(full, 1))
+            line += f", all-to-all {full_s:.2f} s ({1000 * full_s / n:.2f} ms/turbine), max difference {difference:.2%}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
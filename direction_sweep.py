@@ -0,0 +1,242 @@
+'''
+Simul8ors
+
+Pre-rendered direction sweep of the wake map at the selected wind speed. The full
+circle of directions is split into batches and solved on a worker pool. Each worker:
+- solves its batch in one PyWake call (or with the compiled NOJ kernel)
+- rasterizes every frame to RGBA, with one colour scale for all frames (0 m/s to
+  the free wind speed)
+- publishes the frames through shared memory (shared_results.py)
+Playback only swaps the image data, so scrubbing and playing are instant once the
+sweep is built.
+
+A sweep is a snapshot of the layout, settings and view at build time. It is cached
+in memory and in sweep_cache/, keyed by all of these, so building the same sweep
+again loads it instead of solving.
+'''
+
+import hashlib
+import json
+import os
+import queue
+
+import numpy as np
+
+from farm_model import process_pool
+from file_cache import atomic_write
+from shared_results import attach, discard, publish
+from wake_overlay import wake_fields
+
+SWEEP_CACHE = 'sweep_cache'
+COLORMAP = 'Blues_r'
+
+
+def rasterize(fields, ws, alpha, colormap=COLORMAP):
+    """RGBA uint8 frames of shape (frame, y, x, 4) from effective wind speed fields."""
+    from matplotlib import colormaps
+    return colormaps[colormap](np.clip(np.asarray(fields) / ws, 0, 1), alpha=alpha, bytes=True)
+
+
+def render_batch(job):
+    """Worker entry point: solve and rasterize one batch of directions; returns the shared memory handle."""
+    fields = wake_fields(job['farm_loc'], job['ws'], job['wd'], *job['turbine'], job['x_m'], job['y_m'],
+                         job['site'], job['backend'], job['types'], job['heights'])
+    return publish({'frames': rasterize(fields, job['ws'], job['alpha'])})
+
+
+def sweep_key(snapshot, wd, alpha, site_path):
+    """Hash of everything a sweep's frames depend on."""
+    def plain(value):
+        return np.asarray(value).tolist() if isinstance(value, np.ndarray) else value
+    parts = {name: plain(snapshot[name]) for name in ('settings', 'farm_loc', 'types', 'heights', 'x_m', 'y_m',
+                                                      'backend', 'extent')}
+    parts.update(wd=plain(wd), alpha=alpha, site=site_path)
+    text = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+class DirectionSweep:
+
+    def __init__(self, simulator, step=5.0, workers=None, interval_ms=80, alpha=0.45, cache_dir=SWEEP_CACHE,
+                 memory_entries=4):
+        self.simulator = simulator
+        self.step = step
+        self.workers = workers
+        self.interval_ms = interval_ms
+        self.alpha = alpha
+        self.cache_dir = cache_dir
+        self.memory_entries = memory_entries
+        self.cache = {}
+        self.wd = None
+        self.frames = None
+        self.extent = None
+        self.index = 0
+        self.image = None
+        self.pool = None
+        self.building = None
+        self.poll_id = None
+        self.play_id = None
+        self.results = queue.Queue()
+
+    def build(self):
+        """Render the sweep for the current layout, settings and view, or load it from the cache."""
+        snapshot = self.simulator.wake_overlay.snapshot()
+        if snapshot is None:
+            print("Place turbines and choose the turbine settings first.")
+            return
+        ws = float(snapshot['settings'][0])
+        wd = np.arange(0.0, 360.0, self.step)
+        key = sweep_key(snapshot, wd, self.alpha, self.simulator.site_path)
+        cached = self._load(key)
+        if cached is not None:
+            self.show(*cached)
+            return
+        workers = self.workers or os.cpu_count() or 1
+        if self.pool is None:
+            self.pool = process_pool(max_workers=workers)
+        # A few batches per worker, so a slow batch does not hold up the end of the build
+        batches = [batch for batch in np.array_split(wd, 2 * workers) if len(batch)]
+        frames = np.empty((len(wd), len(snapshot['y_m']), len(snapshot['x_m']), 4), dtype=np.uint8)
+        self.building = {'key': key, 'wd': wd, 'extent': snapshot['extent'], 'frames': frames,
+                         'remaining': len(batches)}
+        offset = 0
+        for batch in batches:
+            job = dict(farm_loc=snapshot['farm_loc'], ws=ws, wd=batch, turbine=snapshot['settings'][2:],
+                       x_m=snapshot['x_m'], y_m=snapshot['y_m'], site=snapshot['site'],
+                       backend=snapshot['backend'], types=snapshot['types'], heights=snapshot['heights'],
+                       alpha=self.alpha)
+            future = self.pool.submit(render_batch, job)
+            future.add_done_callback(lambda future, key=key, offset=offset: self.results.put((key, offset, future)))
+            offset += len(batch)
+        print(f"Rendering {len(wd)} directions in {len(batches)} batches")
+        if self.poll_id is None:
+            self.poll_id = self.simulator.root.after(50, self._poll)
+
+    def _poll(self):
+        self.poll_id = None
+        while True:
+            try:
+                key, offset, future = self.results.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                handle = future.result()
+            except Exception as e:
+                print(f"Direction sweep failed: {e}")
+                if self.building is not None and self.building['key'] == key:
+                    self.building = None
+                continue
+            if self.building is None or self.building['key'] != key:
+                discard(handle)
+                continue
+            with attach(handle) as shared:
+                # Copy straight out of the segment; no view may outlive the mapping
+                count = len(shared['frames'])
+                self.building['frames'][offset:offset + count] = shared['frames']
+            self.building['remaining'] -= 1
+            if self.building['remaining'] == 0:
+                building, self.building = self.building, None
+                self._store(building['key'], building['wd'], building['frames'], building['extent'])
+                self.show(building['wd'], building['frames'], building['extent'])
+        if self.building is not None:
+            self.poll_id = self.simulator.root.after(50, self._poll)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'sweep_{key}.npz')
+
+    def _load(self, key):
+        if key in self.cache:
+            return self.cache[key]
+        if os.path.exists(self._path(key)):
+            with np.load(self._path(key)) as data:
+                entry = (data['wd'], data['frames'], list(data['extent']))
+            self._remember(key, entry)
+            return entry
+        return None
+
+    def _store(self, key, wd, frames, extent):
+        self._remember(key, (wd, frames, extent))
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with atomic_write(self._path(key)) as f:
+            np.savez(f, wd=wd, frames=frames, extent=np.asarray(extent, dtype=float))
+
+    def _remember(self, key, entry):
+        self.cache.pop(key, None)
+        self.cache[key] = entry
+        while len(self.cache) > self.memory_entries:
+            self.cache.pop(next(iter(self.cache)))
+
+    def show(self, wd, frames, extent):
+        """Put a built sweep on the canvas at its first direction."""
+        self.pause()
+        self.wd, self.frames, self.extent = np.asarray(wd), frames, list(extent)
+        ax = self.simulator.ax
+        xlim, ylim = ax.get_xlim(), ax.get_ylim()
+        if self.image is not None:
+            self.image.remove()
+        self.image = ax.imshow(frames[0], extent=self.extent, origin='lower', aspect='auto', zorder=1,
+                               interpolation='bilinear')
+        ax.set_xlim(xlim)
+        ax.set_ylim(ylim)
+        slider = self.simulator.sweep_slider
+        slider.configure(from_=float(self.wd[0]), to=float(self.wd[-1]), resolution=float(self.wd[1] - self.wd[0])
+                         if len(self.wd) > 1 else 1.0)
+        slider.set(float(self.wd[0]))
+        self.set_frame(0)
+
+    def set_frame(self, index):
+        if self.frames is None:
+            return
+        self.index = index % len(self.frames)
+        self.image.set_data(self.frames[self.index])
+        self.simulator.renderer.request(changed=True)
+
+    def seek(self, degrees):
+        """Show the frame nearest to a direction in degrees."""
+        if self.wd is None:
+            return
+        self.set_frame(int(np.abs((self.wd - float(degrees) + 180) % 360 - 180).argmin()))
+
+    def toggle_playback(self):
+        if self.play_id is None:
+            self.play()
+        else:
+            self.pause()
+
+    def play(self):
+        if self.frames is None or self.play_id is not None:
+            return
+        self.play_id = self.simulator.root.after(self.interval_ms, self._advance)
+
+    def pause(self):
+        if self.play_id is not None:
+            self.simulator.root.after_cancel(self.play_id)
+            self.play_id = None
+
+    def _advance(self):
+        self.play_id = None
+        # Moving the slider shows the frame through its command
+        self.simulator.sweep_slider.set(float(self.wd[(self.index + 1) % len(self.wd)]))
+        self.play_id = self.simulator.root.after(self.interval_ms, self._advance)
+
+    def clear(self):
+        """Stop playback and remove the sweep from the canvas; the cache is kept."""
+        self.pause()
+        self.building = None
+        self.wd = self.frames = self.extent = None
+        if self.image is not None:
+            self.image.remove()
+            self.image = None
+            self.simulator.renderer.request(changed=True)
+
+    def close(self):
+        """Stop the workers and free the shared memory of unfinished batches; call on exit."""
+        self.pause()
+        self.building = None
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+        while not self.results.empty():
+            _, _, future = self.results.get_nowait()
+            if not future.cancelled() and future.exception() is None:
+                discard(future.result())
@@ -0,0 +1,148 @@
+'''
+Simul8ors
+
+Shared wind farm model setup used by the GUI and its helpers, so every path
+(Submit, live overlay, ...) simulates the same turbines on the same site.
+
+PyWake takes seconds to import, so it is only imported inside the functions that
+need it. The GUI calls warm_up on a background thread at startup, which gets the
+imports out of the way while the user loads a map and places turbines.
+
+Worker pools come from process_pool, which never forks the GUI process: a fork taken
+while the warm-up thread holds an import lock can leave the child blocked forever.
+'''
+
+import importlib
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+FEET_TO_METERS = 0.3048
+VALIDATION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Validation')
+
+
+def direction_to_degrees(direction):
+    """Convert a direction dropdown value to a PyWake wind direction in degrees."""
+    if direction == "North":
+        return 0
+    elif direction == "South":
+        return 180
+    elif direction == "East":
+        return 270
+    else:
+        return 90
+
+
+def make_turbines(Type, D, h):
+    """Build the PyWake turbine object for a turbine type dropdown value."""
+    if Type == "v80 (2)":
+        from py_wake.examples.data.hornsrev1 import V80
+        return V80()
+    elif Type == "iea37 (15)":
+        from py_wake.examples.data.iea37 import IEA37_WindTurbines
+        return IEA37_WindTurbines()
+    elif Type == "dtu10mw (10)":
+        from py_wake.examples.data.dtu10mw import DTU10MW
+        return DTU10MW()
+    else:
+        from py_wake.wind_turbines.generic_wind_turbines import GenericWindTurbine
+        return GenericWindTurbine('User', float(D), float(h), power_norm=10000, turbulence_intensity=.1)
+
+
+def make_site():
+    """Site used by the GUI simulations when no wind resource is loaded."""
+    from py_wake.site import UniformSite
+    return UniformSite(p_wd=[1], ti=0.1)
+
+
+def load_site(path):
+    """Rebuild the fitted site saved by Validation/wind_resource.py as an .npz of its arrays.
+
+    wind_resource owns the cache format and the XRSite constructor, so this goes through
+    its read_site. Only plain arrays are read (no pickles), so any file the user picks is
+    safe to open.
+    """
+    if VALIDATION_DIR not in sys.path:
+        # Appended, so the GUI's own modules still win on a name clash
+        sys.path.append(VALIDATION_DIR)
+    from wind_resource import read_site
+    return read_site(path)
+
+
+def make_wind_farm_model(Type, D, h, site=None):
+    """Build the NOJ wind farm model for the selected turbine settings."""
+    from py_wake import NOJ
+    return NOJ(site if site is not None else make_site(), make_turbines(Type, D, h))
+
+
+def make_farm_turbines(types, D, heights, h=None):
+    """One PyWake WindTurbines object for a layout that mixes turbine types.
+
+    types and heights hold one value per turbine. A NaN height means the default: the
+    dropdown height h for generic turbines, the type's own hub height otherwise.
+    Returns the turbines plus the per-turbine type index and hub height to pass to the
+    wind farm model as type= and h=, so the whole farm is solved in one call.
+    """
+    from py_wake.wind_turbines import WindTurbines
+    types = list(types)
+    heights = np.asarray(heights, dtype=float)
+    h = float(h) if h else np.nan
+    names = list(dict.fromkeys(types))
+    turbine_list = []
+    for name in names:
+        # A generic turbine is built at the dropdown height, or the first height given for it without one
+        given = [height for t, height in zip(types, heights) if t == name and not np.isnan(height)]
+        turbine_list.append(make_turbines(name, D, h if not np.isnan(h) else given[0] if given else 100))
+    windTurbines = WindTurbines.from_WindTurbine_lst(turbine_list)
+    type_index = np.array([names.index(t) for t in types], dtype=int)
+    hub_heights = np.where(np.isnan(heights), windTurbines.hub_height(type_index), heights)
+    return windTurbines, type_index, hub_heights
+
+
+def make_mixed_wind_farm_model(types, D, heights, site=None, h=None):
+    """NOJ model for a mixed layout; returns the model, the type index and hub heights per turbine.
+
+    h is the hub height dropdown value, used by generic turbines without their own height.
+    """
+    from py_wake import NOJ
+    windTurbines, type_index, hub_heights = make_farm_turbines(types, D, heights, h)
+    return NOJ(site if site is not None else make_site(), windTurbines), type_index, hub_heights
+
+
+def make_steering_model(Type, D, h, site=None, windTurbines=None):
+    """Gaussian wake model with Jimenez wake deflection, so yawed turbines steer their wakes.
+
+    windTurbines replaces the single Type turbine, e.g. with make_farm_turbines' for a mixed layout.
+    """
+    from py_wake.deficit_models.gaussian import BastankhahGaussianDeficit
+    from py_wake.deflection_models import JimenezWakeDeflection
+    from py_wake.superposition_models import SquaredSum
+    from py_wake.wind_farm_models import PropagateDownwind
+    return PropagateDownwind(site if site is not None else make_site(),
+                             windTurbines if windTurbines is not None else make_turbines(Type, D, h),
+                             wake_deficitModel=BastankhahGaussianDeficit(use_effective_ws=True),
+                             superpositionModel=SquaredSum(), deflectionModel=JimenezWakeDeflection())
+
+
+def make_mixed_steering_model(types, D, heights, site=None, h=None):
+    """Steering model for a mixed layout; returns the model, the type index and hub heights per turbine."""
+    windTurbines, type_index, hub_heights = make_farm_turbines(types, D, heights, h)
+    return make_steering_model(None, D, h, site, windTurbines), type_index, hub_heights
+
+
+def warm_up():
+    """Import PyWake and run one tiny solve, so the first real simulation starts fast."""
+    for module in ('py_wake', 'py_wake.examples.data.hornsrev1', 'py_wake.examples.data.iea37',
+                   'py_wake.examples.data.dtu10mw'):
+        importlib.import_module(module)
+    wfm = make_wind_farm_model("Generic (10)", 80, 90)
+    wfm([0], [0], wd=[270], ws=[10])
+
+
+def process_pool(max_workers=None):
+    """ProcessPoolExecutor whose workers start from a forkserver (spawn where there is none)."""
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(method))
@@ -0,0 +1,43 @@
+'''
+Simul8ors
+
+Helpers shared by every on-disk cache and result file (sessions, direction sweeps,
+fitted power curves and wind resources, validation results):
+- atomic_write writes to a temporary file next to the target and renames it into
+  place, so a crash or a failed write never leaves a half-written file behind and
+  never clobbers the previous one
+- cache_key hashes input files by path, size and modification time together with
+  the settings a result depends on, so a cache entry is reused only while its inputs
+  are unchanged
+'''
+
+import hashlib
+import os
+from contextlib import contextmanager, suppress
+
+import numpy as np
+
+
+@contextmanager
+def atomic_write(path, mode='wb', **open_args):
+    """Open a temporary file for writing and move it onto path once the block succeeds.
+
+    open_args are passed to open, e.g. newline='' for CSV.
+    """
+    tmp = path + '.tmp'
+    try:
+        with open(tmp, mode, **open_args) as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        with suppress(OSError):
+            os.remove(tmp)
+        raise
+
+
+def cache_key(files, **settings):
+    """Short hash of the input files (path, size, modification time) and the settings."""
+    parts = [f"{os.path.abspath(f)}:{os.path.getsize(f)}:{os.path.getmtime(f)}" for f in files if f is not None]
+    parts += [f"{name}={np.asarray(value).tolist() if value is not None else None}"
+              for name, value in sorted(settings.items())]
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:16]
@@ -0,0 +1,61 @@
+'''
+Simul8ors
+
+Memory-lean flow map export. simulationResult.flow_map() builds the whole float64 grid
+in memory. Here the grid is computed tile by tile: each tile is solved, converted to
+float32 (or any dtype), written into an on-disk .npy store and/or saved as a PNG, and
+then dropped. Peak memory is set by the tile size, not by the grid.
+'''
+
+import os
+
+import numpy as np
+from matplotlib.image import imsave
+
+
+def grid_for_layout(turbine_x, turbine_y, resolution=10.0, margin=500.0):
+    """Grid coordinates (meters) covering the layout plus a margin, spaced resolution apart."""
+    x = np.arange(min(turbine_x) - margin, max(turbine_x) + margin + resolution, resolution)
+    y = np.arange(min(turbine_y) - margin, max(turbine_y) + margin + resolution, resolution)
+    return x, y
+
+
+def tile_field(simulationResult, x, y, wd, ws):
+    """Effective wind speed on one (y, x) tile for a single direction and speed."""
+    from py_wake import HorizontalGrid
+    flow_map = simulationResult.flow_map(HorizontalGrid(x=x, y=y), wd=wd, ws=ws)
+    return flow_map.WS_eff.squeeze().transpose('y', 'x').values
+
+
+def export_flow_map(simulationResult, x, y, wd, ws, npy_path=None, png_dir=None, tile=256, dtype='float32',
+                    cmap='Blues_r'):
+    """Compute WS_eff over the (y, x) grid for each direction in wd, one tile at a time.
+
+    npy_path receives an array of shape (len(wd), len(y), len(x)), written through a
+    memory map, with the grid axes saved next to it in <name>_axes.npz. png_dir receives
+    one PNG per tile named wd<wd>_r<row>_c<col>.png (row 0 at the lowest y), all on the
+    same colour scale (0 to ws) so they can be stitched together. simulationResult must
+    have been solved for every direction in wd.
+    """
+    wd = np.atleast_1d(wd)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    store = None
+    if npy_path is not None:
+        store = np.lib.format.open_memmap(npy_path, mode='w+', dtype=dtype, shape=(len(wd), len(y), len(x)))
+        np.savez(os.path.splitext(npy_path)[0] + '_axes.npz', wd=wd, y=y, x=x)
+    if png_dir is not None:
+        os.makedirs(png_dir, exist_ok=True)
+
+    for k, direction in enumerate(wd):
+        for row, r0 in enumerate(range(0, len(y), tile)):
+            for col, c0 in enumerate(range(0, len(x), tile)):
+                block = tile_field(simulationResult, x[c0:c0 + tile], y[r0:r0 + tile], direction, ws)
+                block = block.astype(dtype, copy=False)
+                if store is not None:
+                    store[k, r0:r0 + block.shape[0], c0:c0 + block.shape[1]] = block
+                if png_dir is not None:
+                    imsave(os.path.join(png_dir, f'wd{direction:g}_r{row}_c{col}.png'), block, origin='lower',
+                           vmin=0, vmax=ws, cmap=cmap)
+        if store is not None:
+            store.flush()
@@ -0,0 +1,86 @@
+'''
+Simul8ors
+
+Records a WindFarmSimulator session's canvas interactions to a JSON lines file, so the
+same stream can be replayed later (see benchmarks/interaction_replay.py). Recorded:
+- resize:  canvas size from <Configure>
+- key:     keysym from <KeyPress>
+- click:   data coordinates and button of a canvas click
+- scroll:  data coordinates and direction of a canvas scroll
+Before an interaction, a state line is written whenever the settings it depends on
+(map, dropdowns, maximum turbines, scale ratio, scale bar mode) changed since the
+last one. Every line carries t, the seconds since recording started.
+'''
+
+import json
+import time
+
+
+class EventRecorder:
+
+    def __init__(self, simulator, path):
+        """Start recording simulator's interactions to path (overwritten)."""
+        self.simulator = simulator
+        self.file = open(path, 'w')
+        self.start = time.perf_counter()
+        self.last_state = None
+        sim = simulator
+        # Bound after the simulator's own handlers, so these run once each handler is done
+        sim.root.bind("<Configure>", self.on_resize, add='+')
+        sim.root.bind("<KeyPress>", self.on_key_press, add='+')
+        self.connections = [
+            sim.canvas.mpl_connect("button_press_event", self.on_click),
+            sim.canvas.mpl_connect("scroll_event", self.on_scroll),
+        ]
+
+    def state(self):
+        sim = self.simulator
+        return {
+            'map_path': sim.map_path,
+            'settings': [sim.speed_combo.get(), sim.direction_combo.get(), sim.type_combo.get(),
+                         sim.d_combo.get(), sim.h_combo.get()],
+            'max_turbines': sim.max_turbines,
+            'pixel_to_real_ratio': sim.pixel_to_real_ratio,
+            'scale_mode': sim.scale_mode,
+        }
+
+    def write(self, kind, **fields):
+        if self.file is None:
+            return
+        state = self.state()
+        if state != self.last_state:
+            self.last_state = state
+            self._write_line('state', state)
+        self._write_line(kind, fields)
+
+    def _write_line(self, kind, fields):
+        line = dict(fields, kind=kind, t=round(time.perf_counter() - self.start, 6))
+        self.file.write(json.dumps(line) + '\n')
+
+    def on_resize(self, event):
+        if event.widget is self.simulator.canvas_widget:
+            self.write('resize', width=event.width, height=event.height)
+
+    def on_key_press(self, event):
+        self.write('key', keysym=event.keysym)
+
+    def on_click(self, event):
+        self.write('click', xdata=event.xdata, ydata=event.ydata, button=int(event.button))
+
+    def on_scroll(self, event):
+        self.write('scroll', xdata=event.xdata, ydata=event.ydata, button=event.button)
+
+    def close(self):
+        """Stop recording and close the file."""
+        for cid in self.connections:
+            self.simulator.canvas.mpl_disconnect(cid)
+        self.connections = []
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def read_events(path):
+    """Recorded lines, in order, as dicts."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
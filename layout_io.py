@@ -0,0 +1,110 @@
+'''
+Simul8ors
+
+Bulk turbine layout import/export. A layout is four equal-length arrays: x and y in
+meters, turbine type and hub height in meters (NaN when the type's default applies).
+Supported formats, chosen by file extension:
+- .csv      header x,y,type,hub_height
+- .geojson  RFC 7946 FeatureCollection of Points in WGS84 longitude/latitude, with
+            type and hub_height as properties. Local meters are projected with an
+            azimuthal equidistant projection around a reference origin (lon, lat),
+            which is also stored as a foreign member for an exact round trip
+- .json     the same FeatureCollection in local meter coordinates (not GeoJSON)
+- .npz      arrays x, y, type, hub_height
+Reading and writing go through whole arrays, so tens of thousands of turbines take
+milliseconds.
+'''
+
+import json
+import os
+
+import numpy as np
+
+CSV_HEADER = 'x,y,type,hub_height'
+
+
+def _normalize(x, y, types, hub_heights):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    types = np.broadcast_to(np.asarray(types, dtype=str), x.shape)
+    hub_heights = np.broadcast_to(np.asarray(hub_heights, dtype=float), x.shape)
+    return x, y, types, hub_heights
+
+
+def _local_projection(origin):
+    """pyproj Transformer from WGS84 lon/lat to meters around origin (lon, lat)."""
+    from pyproj import Transformer
+    lon, lat = origin
+    return Transformer.from_crs('EPSG:4326', f'+proj=aeqd +lat_0={lat} +lon_0={lon} +datum=WGS84 +units=m',
+                                always_xy=True)
+
+
+def _features(x, y, types, hub_heights):
+    return [
+        {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [xi, yi]},
+         'properties': {'type': ti, 'hub_height': None if np.isnan(hi) else hi}}
+        for xi, yi, ti, hi in zip(x.tolist(), y.tolist(), types.tolist(), hub_heights.tolist())
+    ]
+
+
+def save_layout(path, x, y, types, hub_heights, origin=None):
+    """Write a layout; types and hub_heights may be single values for the whole farm.
+
+    origin is the (longitude, latitude) of x = y = 0, required for GeoJSON.
+    """
+    x, y, types, hub_heights = _normalize(x, y, types, hub_heights)
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.npz':
+        np.savez(path, x=x, y=y, type=types, hub_height=hub_heights)
+    elif extension == '.csv':
+        if np.char.find(types, ',').max(initial=-1) >= 0:
+            raise ValueError("Turbine types cannot contain commas in a CSV layout")
+        table = np.empty(len(x), dtype=[('x', 'f8'), ('y', 'f8'), ('type', types.dtype), ('hub_height', 'f8')])
+        table['x'], table['y'], table['type'], table['hub_height'] = x, y, types, hub_heights
+        np.savetxt(path, table, fmt=['%.3f', '%.3f', '%s', '%.2f'], delimiter=',', header=CSV_HEADER,
+                   comments='')
+    elif extension == '.geojson':
+        if origin is None:
+            raise ValueError("GeoJSON needs the longitude and latitude of the layout origin")
+        lon, lat = _local_projection(origin).transform(x, y, direction='INVERSE')
+        with open(path, 'w') as f:
+            json.dump({'type': 'FeatureCollection', 'origin': [float(origin[0]), float(origin[1])],
+                       'features': _features(np.asarray(lon), np.asarray(lat), types, hub_heights)}, f)
+    elif extension == '.json':
+        with open(path, 'w') as f:
+            json.dump({'type': 'FeatureCollection', 'properties': {'units': 'm', 'crs': 'local'},
+                       'features': _features(x, y, types, hub_heights)}, f)
+    else:
+        raise ValueError(f"Unsupported layout format: {extension}")
+
+
+def load_layout(path):
+    """Read a layout written by save_layout; returns x, y, types, hub_heights arrays.
+
+    GeoJSON is projected to meters around its stored origin, or around the centre of its
+    points when it has none. Files marked with a local crs are read as meters.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.npz':
+        with np.load(path) as data:
+            return data['x'], data['y'], data['type'], data['hub_height']
+    elif extension == '.csv':
+        table = np.loadtxt(path, delimiter=',', skiprows=1, ndmin=1,
+                           dtype=[('x', 'f8'), ('y', 'f8'), ('type', 'U64'), ('hub_height', 'f8')])
+        return table['x'], table['y'], table['type'], table['hub_height']
+    elif extension in ('.geojson', '.json'):
+        with open(path) as f:
+            collection = json.load(f)
+        features = collection['features']
+        xy = np.array([feature['geometry']['coordinates'][:2] for feature in features], dtype=float).reshape(-1, 2)
+        local = (collection.get('properties') or {}).get('crs') == 'local'
+        if not local and len(xy):
+            origin = collection.get('origin') or xy.mean(axis=0)
+            xy = np.column_stack(_local_projection(origin).transform(xy[:, 0], xy[:, 1]))
+        properties = [feature.get('properties') or {} for feature in features]
+        types = np.array([p.get('type', '') for p in properties], dtype=str)
+        hub_heights = np.array([np.nan if p.get('hub_height') is None else p['hub_height'] for p in properties],
+                               dtype=float)
+        return xy[:, 0], xy[:, 1], types, hub_heights
+    else:
+        raise ValueError(f"Unsupported layout format: {extension}")
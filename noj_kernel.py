@@ -0,0 +1,155 @@
+'''
+Simul8ors
+
+Compiled NOJ (Jensen) kernel for the interactive path: one wind speed, one direction,
+up to a few hundred turbines. It implements the same model as
+farm_model.make_wind_farm_model:
+- top-hat wake, radius R + k * dw
+- deficit WS * (1 - sqrt(1 - Ct)) * (R / (R + k * dw))^2
+- rotor-averaged by the overlap area of wake and rotor
+- squared-sum superposition
+- Ct and power from the turbine curves at the rotor's effective wind speed
+
+Turbines are solved in upstream order with plain loops. Numba compiles them
+(cache=True, so only the first run pays for compilation), and a solve then takes
+microseconds instead of PyWake's per-call overhead. Numba is optional:
+JIT_AVAILABLE is False without it, and callers fall back to PyWake. The inflow is
+uniform, which matches the GUI's sites (no speed-ups).
+
+check_against_pywake compares turbine power and a flow map with PyWake.
+'''
+
+import math
+
+import numpy as np
+
+try:
+    from numba import njit
+    JIT_AVAILABLE = True
+except ImportError:
+    JIT_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        return lambda function: function
+
+WAKE_EXPANSION = 0.1
+
+
+@njit(cache=True)
+def _overlap_fraction(distance, wake_radius, rotor_radius):
+    """Fraction of the rotor disc covered by the wake disc."""
+    if distance >= wake_radius + rotor_radius:
+        return 0.0
+    if distance <= abs(wake_radius - rotor_radius):
+        return 1.0 if wake_radius >= rotor_radius else (wake_radius / rotor_radius) ** 2
+    a = math.acos(min(1.0, (distance ** 2 + wake_radius ** 2 - rotor_radius ** 2) / (2 * distance * wake_radius)))
+    b = math.acos(min(1.0, (distance ** 2 + rotor_radius ** 2 - wake_radius ** 2) / (2 * distance * rotor_radius)))
+    kite = ((-distance + wake_radius + rotor_radius) * (distance + wake_radius - rotor_radius)
+            * (distance - wake_radius + rotor_radius) * (distance + wake_radius + rotor_radius))
+    lens = wake_radius ** 2 * a + rotor_radius ** 2 * b - 0.5 * math.sqrt(max(0.0, kite))
+    return lens / (math.pi * rotor_radius ** 2)
+
+
+@njit(cache=True)
+def _solve(x, y, ws, wd, radius, k, curve_ws, curve_power, curve_ct):
+    n = x.shape[0]
+    theta = math.radians(wd)
+    # Downstream and crosswind unit vectors for wind coming from wd
+    down_x, down_y = -math.sin(theta), -math.cos(theta)
+    cross_x, cross_y = math.cos(theta), -math.sin(theta)
+    order = np.argsort(x * down_x + y * down_y)
+    ws_eff = np.full(n, ws)
+    ct = np.zeros(n)
+    for a in range(n):
+        j = order[a]
+        squared = 0.0
+        for b in range(a):
+            i = order[b]
+            dx, dy = x[j] - x[i], y[j] - y[i]
+            dw = dx * down_x + dy * down_y
+            if dw <= 0:
+                continue
+            wake_radius = radius + k * dw
+            cw = abs(dx * cross_x + dy * cross_y)
+            fraction = _overlap_fraction(cw, wake_radius, radius)
+            if fraction > 0:
+                deficit = ws * (1 - math.sqrt(max(0.0, 1 - ct[i]))) * (radius / wake_radius) ** 2 * fraction
+                squared += deficit * deficit
+        ws_eff[j] = ws - math.sqrt(squared)
+        ct[j] = np.interp(ws_eff[j], curve_ws, curve_ct)
+    power = np.interp(ws_eff, curve_ws, curve_power)
+    return ws_eff, ct, power
+
+
+@njit(cache=True)
+def _field(x, y, ct, ws, wd, radius, k, grid_x, grid_y):
+    theta = math.radians(wd)
+    down_x, down_y = -math.sin(theta), -math.cos(theta)
+    cross_x, cross_y = math.cos(theta), -math.sin(theta)
+    field = np.empty((grid_y.shape[0], grid_x.shape[0]))
+    for r in range(grid_y.shape[0]):
+        for c in range(grid_x.shape[0]):
+            squared = 0.0
+            for i in range(x.shape[0]):
+                dx, dy = grid_x[c] - x[i], grid_y[r] - y[i]
+                dw = dx * down_x + dy * down_y
+                if dw <= 0:
+                    continue
+                wake_radius = radius + k * dw
+                if abs(dx * cross_x + dy * cross_y) < wake_radius:
+                    deficit = ws * (1 - math.sqrt(max(0.0, 1 - ct[i]))) * (radius / wake_radius) ** 2
+                    squared += deficit * deficit
+            field[r, c] = ws - math.sqrt(squared)
+    return field
+
+
+class JensenKernel:
+
+    def __init__(self, Type, D, h, k=WAKE_EXPANSION, ws_max=30.0, ws_step=0.05):
+        """Tabulate the turbine's power and Ct curves once, from the same turbine PyWake uses."""
+        from farm_model import make_turbines
+        turbines = make_turbines(Type, D, h)
+        self.radius = float(turbines.diameter()) / 2
+        self.k = float(k)
+        self.curve_ws = np.arange(0.0, ws_max + ws_step, ws_step)
+        self.curve_power = np.asarray(turbines.power(self.curve_ws), dtype=float)
+        self.curve_ct = np.asarray(turbines.ct(self.curve_ws), dtype=float)
+
+    def solve(self, x, y, wd, ws):
+        """Effective wind speed, Ct and power (W) per turbine."""
+        return _solve(np.asarray(x, dtype=float), np.asarray(y, dtype=float), float(ws), float(wd), self.radius,
+                      self.k, self.curve_ws, self.curve_power, self.curve_ct)
+
+    def flow_map(self, x, y, wd, ws, grid_x, grid_y):
+        """Effective wind speed on the (grid_y, grid_x) grid."""
+        _, ct, _ = self.solve(x, y, wd, ws)
+        return _field(np.asarray(x, dtype=float), np.asarray(y, dtype=float), ct, float(ws), float(wd), self.radius,
+                      self.k, np.asarray(grid_x, dtype=float), np.asarray(grid_y, dtype=float))
+
+
+_kernels = {}
+
+
+def get_kernel(Type, D, h):
+    """Kernel for the turbine settings, built once per process."""
+    key = (Type, D, h)
+    if key not in _kernels:
+        _kernels[key] = JensenKernel(Type, D, h)
+    return _kernels[key]
+
+
+def check_against_pywake(Type, D, h, x, y, wd, ws, grid_x=None, grid_y=None):
+    """Largest relative power difference and largest flow map difference (m/s) against PyWake's NOJ."""
+    from farm_model import make_wind_farm_model
+    kernel = get_kernel(Type, D, h)
+    _, _, power = kernel.solve(x, y, wd, ws)
+    simulationResult = make_wind_farm_model(Type, D, h)(x, y, wd=[wd], ws=[ws])
+    reference = simulationResult.Power.values.reshape(-1)
+    power_error = float(np.max(np.abs(power - reference)) / max(np.max(reference), 1.0))
+    if grid_x is None:
+        return power_error, None
+    from py_wake import HorizontalGrid
+    flow_map = simulationResult.flow_map(HorizontalGrid(x=grid_x, y=grid_y), wd=wd, ws=ws)
+    field_reference = flow_map.WS_eff.squeeze().transpose('y', 'x').values
+    field = kernel.flow_map(x, y, wd, ws, grid_x, grid_y)
+    return power_error, float(np.max(np.abs(field - field_reference)))
@@ -0,0 +1,46 @@
+'''
+Simul8ors
+
+Coalesces redraw requests from the GUI event handlers. Resize, pan and zoom events
+only mark the canvas as needing a redraw; at most one render happens per frame
+interval, and it is skipped when nothing visible has changed since the last one.
+'''
+
+import time
+
+
+class RenderScheduler:
+
+    def __init__(self, root, render, view_state, frame_ms=33):
+        self.root = root
+        self.render = render
+        self.view_state = view_state
+        self.frame_ms = frame_ms
+        self.after_id = None
+        self.dirty = False
+        self.last_state = None
+        self.last_render = 0.0
+        self.renders = 0
+        self.skipped = 0
+
+    def request(self, changed=False):
+        """Ask for a redraw. Pass changed=True when artists changed without moving the view."""
+        self.dirty = self.dirty or changed
+        if self.after_id is not None:
+            return
+        elapsed_ms = (time.perf_counter() - self.last_render) * 1000
+        delay = max(0, int(self.frame_ms - elapsed_ms))
+        self.after_id = self.root.after(delay, self.flush)
+
+    def flush(self):
+        """Render now if anything visible changed since the last render."""
+        self.after_id = None
+        state = self.view_state()
+        if not self.dirty and state == self.last_state:
+            self.skipped += 1
+            return
+        self.dirty = False
+        self.last_state = state
+        self.last_render = time.perf_counter()
+        self.render()
+        self.renders += 1
@@ -0,0 +1,72 @@
+'''
+Simul8ors
+
+Session files for WindFarmSimulator. A session is a single uncompressed .npz file
+holding a JSON manifest (settings, scale ratio, file references, view) next to the
+named arrays (turbine layout, cached results). np.load reads npz members only when
+they are accessed, so restoring a session only touches the arrays that are used.
+'''
+
+import json
+
+import numpy as np
+
+from file_cache import atomic_write
+
+FORMAT_VERSION = 1
+MANIFEST_KEY = 'manifest'
+
+
+def save_session(path, manifest, arrays):
+    """Write the manifest dict and the named arrays to path in one file."""
+    manifest = dict(manifest, format_version=FORMAT_VERSION, arrays=sorted(arrays))
+    payload = {MANIFEST_KEY: np.frombuffer(json.dumps(manifest).encode('utf-8'), dtype=np.uint8)}
+    payload.update({name: np.asarray(value) for name, value in arrays.items()})
+    with atomic_write(path) as f:
+        np.savez(f, **payload)
+
+
+class LazyArrays:
+    """Read-only mapping over the arrays in a session whose names start with prefix."""
+
+    def __init__(self, session, prefix):
+        self.session = session
+        self.prefix = prefix
+
+    def keys(self):
+        return [name[len(self.prefix):] for name in self.session.names() if name.startswith(self.prefix)]
+
+    def __contains__(self, name):
+        return self.prefix + name in self.session
+
+    def __getitem__(self, name):
+        return self.session[self.prefix + name]
+
+
+class Session:
+
+    def __init__(self, path):
+        self.path = path
+        self.npz = np.load(path, allow_pickle=False)
+        self.manifest = json.loads(self.npz[MANIFEST_KEY].tobytes().decode('utf-8'))
+        if self.manifest.get('format_version', 0) > FORMAT_VERSION:
+            raise ValueError(f"{path} was written by a newer version (format {self.manifest['format_version']})")
+        self.loaded = {}
+
+    def names(self):
+        return [name for name in self.npz.files if name != MANIFEST_KEY]
+
+    def __contains__(self, name):
+        return name in self.npz.files
+
+    def __getitem__(self, name):
+        """Load an array on first access and keep it for later ones."""
+        if name not in self.loaded:
+            self.loaded[name] = self.npz[name]
+        return self.loaded[name]
+
+    def arrays(self, prefix):
+        return LazyArrays(self, prefix)
+
+    def close(self):
+        self.npz.close()
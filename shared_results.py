@@ -0,0 +1,109 @@
+'''
+Simul8ors
+
+Shared-memory transport for large NumPy results between worker processes and the GUI.
+A worker publishes its arrays into multiprocessing.shared_memory segments and returns
+only a small picklable handle (segment names, shapes, dtypes). The GUI attaches to the
+segments and reads the arrays in place, which saves pickling them through the pool.
+Whatever the receiver does next may still copy them (matplotlib's imshow does).
+
+Lifetime: the process that attaches owns the segments. A worker publishes and closes
+its own mapping but never unlinks. The receiver calls release() once it is done with
+the arrays, which closes and unlinks every segment of the job. If a handle is never
+attached (for example, a job is cancelled), call discard(handle) instead. When several
+readers share one handle, each reader calls close() and the publisher calls
+discard(handle) once all of them are done.
+'''
+
+import uuid
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+PREFIX = 'simul8ors_'
+
+
+def publish(arrays):
+    """Copy named arrays into new shared memory segments; returns a picklable handle.
+
+    Call this in the worker; the handle is what gets sent back to the GUI.
+    """
+    job = uuid.uuid4().hex[:12]
+    handle = {'job': job, 'arrays': {}}
+    for name, value in arrays.items():
+        value = np.ascontiguousarray(value)
+        segment = shared_memory.SharedMemory(name=f'{PREFIX}{job}_{len(handle["arrays"])}', create=True,
+                                             size=max(value.nbytes, 1))
+        np.ndarray(value.shape, dtype=value.dtype, buffer=segment.buf)[...] = value
+        handle['arrays'][name] = (segment.name, value.shape, value.dtype.str)
+        segment.close()
+        # The receiver unlinks; stop this process's tracker from unlinking when the worker exits
+        resource_tracker.unregister(segment._name, 'shared_memory')
+    return handle
+
+
+class SharedResult:
+    """Zero-copy views of a published job's arrays, plus the segments behind them."""
+
+    def __init__(self, handle):
+        self.job = handle['job']
+        self.segments = {}
+        self.arrays = {}
+        for name, (segment_name, shape, dtype) in handle['arrays'].items():
+            segment = shared_memory.SharedMemory(name=segment_name)
+            self.segments[name] = segment
+            array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+            array.flags.writeable = False
+            self.arrays[name] = array
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def keys(self):
+        return self.arrays.keys()
+
+    def copy(self):
+        """Plain in-memory copies, for results that must outlive release()."""
+        return {name: np.array(array) for name, array in self.arrays.items()}
+
+    def close(self):
+        """Close this process's mappings but leave the segments for other readers."""
+        self.arrays = {}
+        for segment in self.segments.values():
+            segment.close()
+            # Attaching registered the segment with this process's tracker; the publisher owns it
+            resource_tracker.unregister(segment._name, 'shared_memory')
+        self.segments = {}
+
+    def release(self):
+        """Close and unlink every segment; the arrays must not be used afterwards."""
+        self.arrays = {}
+        for segment in self.segments.values():
+            segment.close()
+            try:
+                segment.unlink()
+            except FileNotFoundError:
+                pass
+        self.segments = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def attach(handle):
+    """Map a published job's arrays in this process; release() the result when done."""
+    return SharedResult(handle)
+
+
+def discard(handle):
+    """Unlink the segments of a handle that will never be attached."""
+    for segment_name, _, _ in handle['arrays'].values():
+        try:
+            segment = shared_memory.SharedMemory(name=segment_name)
+        except FileNotFoundError:
+            continue
+        segment.close()
+        segment.unlink()
@@ -0,0 +1,125 @@
+'''
+Simul8ors
+
+Monte Carlo AEP uncertainty. Each sample perturbs the inflow and the turbine:
+- a wind speed bias (multiplicative),
+- a wind direction offset,
+- the turbulence intensity,
+- a power curve scale factor.
+
+A batch of samples is solved in one PyWake time-series call. Every
+(sample, wd, ws) combination is one time step, weighted with the probability
+of its unperturbed (wd, ws) cell. Batches are spread over a process pool. Each
+batch draws from its own child of one SeedSequence, so results do not depend on
+the number of workers. Rounds of batches run until P50 and P90 stop moving.
+
+The layout is solved like Submit's: every turbine keeps its own type and hub height
+(farm_model.make_mixed_wind_farm_model).
+'''
+
+import numpy as np
+
+from farm_model import make_mixed_wind_farm_model, process_pool
+
+HOURS_PER_YEAR = 24 * 365
+
+DEFAULT_SPREAD = {
+    'ws_bias': 0.05,      # standard deviation of the wind speed factor
+    'wd_offset': 5.0,     # standard deviation of the direction offset, degrees
+    'ti': 0.02,           # standard deviation of the turbulence intensity
+    'power_curve': 0.03,  # standard deviation of the power curve factor
+}
+
+
+def layout_model(Type, D, h, site, n, types=None, heights=None):
+    """Model, type index and hub heights for n turbines; by default every turbine is Type at the default height."""
+    types = [Type] * n if types is None else list(types)
+    heights = np.full(n, np.nan) if heights is None else heights
+    return make_mixed_wind_farm_model(types, D, heights, site, h)
+
+
+def condition_probability(Type, D, h, site, x, y, wd, ws, types=None, heights=None):
+    """Probability of each (wd, ws) cell and the deterministic AEP (GWh) on the same grid."""
+    wfm, type_index, hub_heights = layout_model(Type, D, h, site, len(x), types, heights)
+    simulationResult = wfm(x, y, h=hub_heights, type=type_index, wd=wd, ws=ws)
+    P = simulationResult.P.broadcast_like(simulationResult.Power).isel(wt=0).transpose('wd', 'ws').values
+    return P, float(simulationResult.aep().sum())
+
+
+def draw_samples(seed, n, spread, ti):
+    """Perturbation factors for n samples from one child seed."""
+    rng = np.random.default_rng(seed)
+    return {
+        'ws_bias': rng.normal(1.0, spread['ws_bias'], n),
+        'wd_offset': rng.normal(0.0, spread['wd_offset'], n),
+        'ti': np.clip(rng.normal(ti, spread['ti'], n), 0.01, None),
+        'power_curve': rng.normal(1.0, spread['power_curve'], n),
+    }
+
+
+def evaluate_batch(job):
+    """AEP (GWh) for one batch of samples, solved as a single time series."""
+    Type, D, h, site, x, y, wd, ws, P, seed, n, spread, ti, types, heights = job
+    samples = draw_samples(seed, n, spread, ti)
+    wd = np.asarray(wd, dtype=float)
+    ws = np.asarray(ws, dtype=float)
+    # (sample, wd, ws) flattened into one time axis
+    shape = (n, len(wd), len(ws))
+    wd_t = (wd[None, :, None] + samples['wd_offset'][:, None, None]) % 360
+    ws_t = np.clip(ws[None, None, :] * samples['ws_bias'][:, None, None], 0, None)
+    ti_t = np.broadcast_to(samples['ti'][:, None, None], shape)
+    wd_t = np.broadcast_to(wd_t, shape).ravel()
+    ws_t = np.broadcast_to(ws_t, shape).ravel()
+
+    wfm, type_index, hub_heights = layout_model(Type, D, h, site, len(x), types, heights)
+    simulationResult = wfm(x, y, h=hub_heights, type=type_index, wd=wd_t, ws=ws_t, TI=ti_t.ravel(), time=True)
+    farm_power = simulationResult.Power.values.sum(axis=0).reshape(shape)  # W
+    farm_power = farm_power * samples['power_curve'][:, None, None]
+    return (farm_power * P[None]).sum(axis=(1, 2)) * HOURS_PER_YEAR * 1e-9
+
+
+def summarize(aep):
+    """Mean, P50, P90 and the 95% confidence interval of the mean, in GWh."""
+    mean = aep.mean()
+    half_width = 1.96 * aep.std(ddof=1) / np.sqrt(len(aep)) if len(aep) > 1 else np.inf
+    return {
+        'samples': len(aep),
+        'mean': mean,
+        'P50': np.percentile(aep, 50),
+        'P90': np.percentile(aep, 10),  # exceeded with 90% probability
+        'ci_low': mean - half_width,
+        'ci_high': mean + half_width,
+    }
+
+
+def run_uncertainty(Type, D, h, x, y, wd, ws, site=None, spread=None, ti=0.1, seed=0, batch_size=200,
+                    round_batches=8, max_samples=20000, min_samples=1000, tol=0.002, workers=None, types=None,
+                    heights=None, stop=None):
+    """Sample AEP until P50 and P90 change by less than tol (relative) between rounds.
+
+    A round is round_batches batches of batch_size samples, whatever the number of workers.
+    types and heights give each turbine's own type and hub height, as in Submit. stop is
+    an optional threading.Event; once it is set, sampling ends after the current round.
+
+    Returns the deterministic AEP, the final summary and the summary after every round.
+    """
+    spread = dict(DEFAULT_SPREAD, **(spread or {}))
+    P, deterministic = condition_probability(Type, D, h, site, x, y, wd, ws, types, heights)
+    n_batches = int(np.ceil(max_samples / batch_size))
+    seeds = np.random.SeedSequence(seed).spawn(n_batches)
+    jobs = [(Type, D, h, site, x, y, wd, ws, P, child, batch_size, spread, ti, types, heights) for child in seeds]
+
+    aep = np.empty(0)
+    history = []
+    with process_pool(max_workers=workers) as pool:
+        for start in range(0, n_batches, round_batches):
+            # Batches are concatenated in seed order, so the result is independent of scheduling
+            aep = np.concatenate([aep] + list(pool.map(evaluate_batch, jobs[start:start + round_batches])))
+            history.append(summarize(aep))
+            if stop is not None and stop.is_set():
+                break
+            if len(history) > 1 and len(aep) >= min_samples:
+                previous, current = history[-2], history[-1]
+                if all(abs(current[key] - previous[key]) <= tol * abs(previous[key]) for key in ('P50', 'P90')):
+                    break
+    return deterministic, history[-1], history
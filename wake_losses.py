@@ -0,0 +1,99 @@
+'''
+Simul8ors
+
+Wake loss breakdown per turbine x direction sector x wind speed bin. The layout is
+solved once over every direction (wd_step apart) and wind speed bin. Net energy is
+that power weighted by the site's (wd, ws) probability. Gross energy uses the no-wake
+power instead: each turbine's power curve at the free wind speed. The directions are
+then summed into sectors with one matrix product, and loss = 1 - net / gross per cell.
+
+The no-wake power does not depend on the layout, so it is computed once per turbine
+model and wind speed grid and kept for the rest of the session. This assumes the
+free stream is the same at every turbine, which holds for the GUI's sites (uniform,
+or fitted from SCADA without speed-ups).
+
+Large layouts are solved cluster by cluster with the sparse wake graph (wake_graph.py).
+'''
+
+import numpy as np
+
+from farm_model import make_turbines
+from wake_graph import HOURS_PER_YEAR, build_wake_graph, sector_index, sparse_power
+
+NAMED_TYPES = ("v80 (2)", "iea37 (15)", "dtu10mw (10)")
+
+_baselines = {}
+
+
+def no_wake_power(Type, D, ws):
+    """Free-stream power (W) of one turbine model over ws, computed once per model and ws grid."""
+    ws = np.asarray(ws, dtype=float)
+    # A generic turbine's curve depends on its diameter only; the named types ignore D
+    key = (Type, None if Type in NAMED_TYPES else float(D), tuple(ws))
+    if key not in _baselines:
+        _baselines[key] = np.asarray(make_turbines(Type, D, 100).power(ws), dtype=float)
+    return _baselines[key]
+
+
+def wake_loss_breakdown(wind_farm_model, x, y, types, D, type_index=None, h=None, n_sectors=12, wd_step=5.0,
+                        ws=np.arange(3.0, 26.0), sparse=False):
+    """Gross and net energy (GWh), wake loss and efficiency per turbine, sector and ws bin.
+
+    types are the turbine model names in type order (as make_farm_turbines numbers
+    them); type_index and h are the per-turbine type and hub height. Returns a dict:
+    sectors (centres, degrees), ws, gross and net of shape (turbine, sector, ws), loss
+    (0 where there is no gross energy), and efficiency per turbine (net / gross over
+    every sector and speed).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    ws = np.asarray(ws, dtype=float)
+    wd = np.arange(0.0, 360.0, wd_step)
+    type_index = np.zeros(len(x), dtype=int) if type_index is None else np.asarray(type_index)
+    sectors = np.arange(n_sectors) * 360.0 / n_sectors
+
+    if sparse:
+        diameter = wind_farm_model.windTurbines.diameter(type_index)
+        # One graph per exact direction: a graph covering a whole sector couples far more turbines
+        graphs = build_wake_graph(x, y, diameter, wd)
+        net = sparse_power(wind_farm_model, x, y, wd, ws, wd, graphs, type_index=type_index, h=h)
+        # The probability of each (wd, ws) cell does not depend on the layout; one turbine is enough to get it
+        reference = wind_farm_model([x[0]], [y[0]], wd=wd, ws=ws)
+    else:
+        reference = wind_farm_model(x, y, h=h, type=type_index, wd=wd, ws=ws)
+        net = reference.Power.values.reshape(len(x), len(wd), len(ws))
+    P = reference.P.broadcast_like(reference.Power).isel(wt=0).transpose('wd', 'ws').values
+
+    baseline = np.stack([no_wake_power(Type, D, ws) for Type in types])
+    gross = np.broadcast_to(baseline[type_index][:, None, :], net.shape)
+    # One column per sector: which directions it sums
+    in_sector = np.eye(n_sectors)[sector_index(sectors, wd)]
+    weight = P * HOURS_PER_YEAR * 1e-9
+    net_energy = np.einsum('twv,wv,ws->tsv', net, weight, in_sector)
+    gross_energy = np.einsum('twv,wv,ws->tsv', gross, weight, in_sector)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        loss = np.where(gross_energy > 0, 1 - net_energy / gross_energy, 0.0)
+        efficiency = net_energy.sum(axis=(1, 2)) / gross_energy.sum(axis=(1, 2))
+    return {'sectors': sectors, 'ws': ws, 'gross': gross_energy, 'net': net_energy, 'loss': loss,
+            'efficiency': efficiency}
+
+
+def farm_loss(breakdown):
+    """Farm wake loss per (sector, ws bin)."""
+    gross = breakdown['gross'].sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(gross > 0, 1 - breakdown['net'].sum(axis=0) / gross, 0.0)
+
+
+def save_breakdown(path, breakdown):
+    """Write every array of a breakdown to an .npz file."""
+    np.savez(path, **breakdown)
+
+
+def draw_efficiency(ax, canvas_x, canvas_y, efficiency):
+    """Turbines coloured by wake efficiency, with the percentage next to each; returns the artists."""
+    points = ax.scatter(canvas_x, canvas_y, c=efficiency, cmap='RdYlGn', vmin=0.7, vmax=1.0, s=60,
+                        edgecolors='black', zorder=4)
+    labels = [ax.annotate(f"{100 * e:.1f}%", (cx, cy), textcoords='offset points', xytext=(6, 6), fontsize=8,
+                          zorder=4) for cx, cy, e in zip(canvas_x, canvas_y, efficiency)]
+    return [points] + labels
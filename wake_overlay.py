@@ -0,0 +1,224 @@
+'''
+Simul8ors
+
+Live wake overlay for the WindFarmSimulator canvas. The wake map is recomputed in a
+worker process, debounced after each change, and drawn semi-transparently on top of
+the map in canvas units. Results from superseded requests are thrown away.
+
+The worker hands the field back through shared memory (see shared_results), which
+saves pickling it through the pool; imshow still copies it into its own image. The
+overlay holds the segment of the field on screen (self.field views it) and releases
+it when the field is replaced or cleared.
+'''
+
+import queue
+
+import numpy as np
+
+from farm_model import FEET_TO_METERS, direction_to_degrees, make_mixed_wind_farm_model, process_pool
+from shared_results import attach, discard, publish
+
+
+def wake_fields(farm_loc, ws, wd, Type, D, h, x_m, y_m, site=None, backend='pywake', types=None, heights=None):
+    """Effective wind speed on the (y_m, x_m) grid for each direction in wd (degrees), shape (wd, y, x).
+
+    Turbines are at farm_loc (meters). types and heights give each turbine's own type
+    and hub height (NaN for the default: h for generic turbines, the type's own hub
+    height otherwise); by default every turbine is Type. All directions are solved in one PyWake call. backend 'jit' uses the
+    compiled NOJ kernel (noj_kernel.py) when Numba is installed and the farm has a
+    single type and height.
+    """
+    turbine_x = [loc[0] for loc in farm_loc]
+    turbine_y = [loc[1] for loc in farm_loc]
+    ws = float(ws)
+    wd = np.atleast_1d(np.asarray(wd, dtype=float))
+    types = [Type] * len(farm_loc) if types is None else list(types)
+    heights = np.full(len(farm_loc), np.nan) if heights is None else np.asarray(heights, float)
+    uniform = len(set(types)) == 1 and len(np.unique(heights)) == 1
+    if backend == 'jit' and uniform:
+        from noj_kernel import JIT_AVAILABLE, get_kernel
+        if JIT_AVAILABLE:
+            kernel = get_kernel(types[0], D, h)
+            return np.stack([kernel.flow_map(turbine_x, turbine_y, d, ws, x_m, y_m) for d in wd])
+    from py_wake import HorizontalGrid
+    wfm, type_index, hub_heights = make_mixed_wind_farm_model(types, D, heights, site, h)
+    simulationResult = wfm(turbine_x, turbine_y, h=hub_heights, type=type_index, wd=wd, ws=[ws])
+    grid = HorizontalGrid(x=x_m, y=y_m)
+    return np.stack([simulationResult.flow_map(grid, ws=ws, wd=d).WS_eff.squeeze().transpose('y', 'x').values
+                     for d in wd])
+
+
+def compute_wake_field(farm_loc, speed, direction, Type, D, h, x_m, y_m, site=None, backend='pywake', types=None,
+                       heights=None):
+    """Effective wind speed on the (y_m, x_m) grid for the dropdown speed and direction; see wake_fields."""
+    return wake_fields(farm_loc, speed, [direction_to_degrees(direction)], Type, D, h, x_m, y_m, site, backend,
+                       types, heights)[0]
+
+
+def compute_shared_wake_field(job):
+    """Worker entry point: compute the field and publish it; returns the shared memory handle."""
+    field = compute_wake_field(job['farm_loc'], *job['settings'], job['x_m'], job['y_m'], job['site'],
+                               job['backend'], job['types'], job['heights'])
+    return publish({'field': field})
+
+
+class WakeOverlay:
+
+    def __init__(self, simulator, delay_ms=300, resolution=80, alpha=0.45):
+        self.simulator = simulator
+        self.delay_ms = delay_ms
+        self.resolution = resolution
+        self.alpha = alpha
+        self.enabled = True
+        self.backend = 'pywake'
+        self.image = None
+        self.field = None
+        self.shared = None
+        self.extent = None
+        self.pool = None
+        self.generation = 0
+        self.after_id = None
+        self.poll_id = None
+        self.busy = False
+        self.pending = None
+        self.results = queue.Queue()
+
+    def schedule(self, event=None):
+        """Request a recompute; bursts of requests within delay_ms collapse into one."""
+        root = self.simulator.root
+        # Every request invalidates whatever is currently being computed
+        self.generation += 1
+        if self.after_id is not None:
+            root.after_cancel(self.after_id)
+        self.after_id = root.after(self.delay_ms, self._start)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        if enabled:
+            self.schedule()
+        else:
+            self.generation += 1
+            self.clear()
+
+    def clear(self):
+        self.field = None
+        self.extent = None
+        self._release()
+        if self.image is not None:
+            self.image.remove()
+            self.image = None
+            self.simulator.renderer.request(changed=True)
+
+    def snapshot(self):
+        """Collect everything the worker needs, so it never touches Tk or the axes."""
+        sim = self.simulator
+        settings = (sim.speed_combo.get(), sim.direction_combo.get(), sim.type_combo.get(),
+                    sim.d_combo.get(), sim.h_combo.get())
+        speed, _, Type, D, h = settings
+        if not sim.coordinates or not speed:
+            return None
+        types = sim.layout_types(Type)
+        # Generic turbines need a diameter; their height comes from the turbine or the dropdown
+        if any(t not in ("v80 (2)", "iea37 (15)", "dtu10mw (10)") for t in types) and not (D and h):
+            return None
+        xlim = sim.ax.get_xlim()
+        ylim = sim.ax.get_ylim()
+        # Canvas units -> feet -> meters, the same chain used for the turbines
+        to_meters = sim.pixel_to_real_ratio * FEET_TO_METERS
+        x_canvas = np.linspace(xlim[0], xlim[1], self.resolution)
+        y_canvas = np.linspace(ylim[0], ylim[1], self.resolution)
+        farm_loc = [(x * FEET_TO_METERS, y * FEET_TO_METERS) for x, y in sim.coordinates]
+        return dict(generation=self.generation, settings=settings, farm_loc=farm_loc,
+                    types=types, heights=list(sim.turbine_heights),
+                    x_m=x_canvas * to_meters, y_m=y_canvas * to_meters, site=sim.site, backend=self.backend,
+                    extent=[xlim[0], xlim[1], ylim[0], ylim[1]])
+
+    def _start(self):
+        self.after_id = None
+        if not self.enabled:
+            return
+        job = self.snapshot()
+        if job is None:
+            self.clear()
+            return
+        if self.busy:
+            # Only one worker at a time; the newest request runs when it finishes
+            self.pending = job
+            return
+        self._launch(job)
+
+    def _launch(self, job):
+        self.busy = True
+        if self.pool is None:
+            # Created on first use; the worker starts fresh rather than forking the GUI mid warm-up
+            self.pool = process_pool(max_workers=1)
+        future = self.pool.submit(compute_shared_wake_field, job)
+        future.add_done_callback(lambda future: self.results.put((job, future)))
+        if self.poll_id is None:
+            self.poll_id = self.simulator.root.after(50, self._poll)
+
+    def _poll(self):
+        self.poll_id = None
+        try:
+            job, future = self.results.get_nowait()
+        except queue.Empty:
+            self.poll_id = self.simulator.root.after(50, self._poll)
+            return
+        self.busy = False
+        try:
+            handle = future.result()
+        except Exception as e:
+            print(f"Wake overlay failed: {e}")
+            handle = None
+        if handle is not None:
+            if job['generation'] == self.generation and self.enabled:
+                shared = attach(handle)
+                self.show(shared['field'], job['extent'], shared)
+            else:
+                # Superseded: nobody will ever attach, so free the segment now
+                discard(handle)
+        if self.pending is not None:
+            job, self.pending = self.pending, None
+            if job['generation'] == self.generation:
+                self._launch(job)
+
+    def show(self, field, extent, shared=None):
+        """Draw a wake field covering extent (canvas units) on the canvas.
+
+        shared is the SharedResult that field is a view of, if any; the overlay keeps it
+        alive while the field is on screen.
+        """
+        # Drop the view of the old segment before unmapping it
+        self.field = None
+        self._release()
+        self.field = field
+        self.shared = shared
+        self.extent = list(extent)
+        ax = self.simulator.ax
+        xlim, ylim = ax.get_xlim(), ax.get_ylim()
+        if self.image is not None:
+            self.image.remove()
+        self.image = ax.imshow(field, extent=extent, origin='lower', cmap='Blues_r',
+                               alpha=self.alpha, aspect='auto', zorder=1, interpolation='bilinear')
+        ax.set_xlim(xlim)
+        ax.set_ylim(ylim)
+        self.simulator.renderer.request(changed=True)
+
+    def _release(self):
+        if self.shared is not None:
+            self.shared.release()
+            self.shared = None
+
+    def close(self):
+        """Free the field's shared memory and stop the worker process; call on exit."""
+        self.generation += 1
+        self.field = None
+        self._release()
+        if self.pool is not None:
+            # Wait for a field still being computed, so its segment can be unlinked below
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+        while not self.results.empty():
+            _, future = self.results.get_nowait()
+            if not future.cancelled() and future.exception() is None:
+                discard(future.result())
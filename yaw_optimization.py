@@ -0,0 +1,123 @@
+'''
+Simul8ors
+
+Wake steering yaw optimization. For every (wind direction sector, wind speed) cell, it
+finds per-turbine yaw offsets that maximise farm power under a model with wake
+deflection (farm_model.make_steering_model).
+
+The search is a batched coordinate search. Turbines are visited from upwind to
+downwind. For the current turbine, every candidate angle in every cell is written
+into one yaw matrix and solved as a single PyWake time series, with one time step
+per (cell, candidate). The best angle per cell is then kept. The most downwind
+turbine has nothing to steer its wake onto, so it stays at 0.
+
+The result is a yaw table with yaw of shape (sector, ws, turbine) in degrees. It
+saves to .npz and is looked up by nearest sector and wind speed in later AEP runs.
+
+type_index and h are the per-turbine type and hub height of a mixed layout, as
+returned by farm_model.make_mixed_steering_model; every solve passes them on.
+'''
+
+import numpy as np
+
+YAW_CANDIDATES = np.arange(-30.0, 31.0, 5.0)
+
+
+def upwind_order(x, y, wd):
+    """Turbine indices from most upwind to most downwind for wind from wd (degrees)."""
+    theta = np.deg2rad(wd)
+    # Distance along the direction the wind comes from; larger means further upwind
+    return np.argsort(-(np.asarray(x) * np.sin(theta) + np.asarray(y) * np.cos(theta)), kind='stable')
+
+
+def farm_power(wind_farm_model, x, y, wd, ws, yaw, batch_size=20000, type_index=None, h=None):
+    """Farm power (W) for n cases: wd and ws of shape (n,), yaw of shape (n, turbine)."""
+    type_index = np.zeros(len(x), dtype=int) if type_index is None else type_index
+    power = np.empty(len(wd))
+    for start in range(0, len(wd), batch_size):
+        stop = start + batch_size
+        simulationResult = wind_farm_model(x, y, h=h, type=type_index, wd=wd[start:stop], ws=ws[start:stop],
+                                           yaw=yaw[start:stop].T, tilt=0, time=True)
+        power[start:stop] = simulationResult.Power.values.sum(axis=0)
+    return power
+
+
+def optimize_yaw(wind_farm_model, x, y, wd, ws, candidates=YAW_CANDIDATES, passes=2, rtol=1e-6,
+                 batch_size=20000, type_index=None, h=None):
+    """Yaw table for every (wd, ws) cell; wind_farm_model must model wake deflection.
+
+    Stops early when a pass changes no angle. Returns a dict with yaw (sector, ws,
+    turbine), wd, ws, x, y and the farm power (W) without and with steering.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    wd = np.atleast_1d(np.asarray(wd, dtype=float))
+    ws = np.atleast_1d(np.asarray(ws, dtype=float))
+    candidates = np.asarray(candidates, dtype=float)
+    n_wd, n_ws, n_wt, n_c = len(wd), len(ws), len(x), len(candidates)
+    cell_wd = np.repeat(wd, n_ws)
+    cell_ws = np.tile(ws, n_wd)
+
+    yaw = np.zeros((n_wd, n_ws, n_wt))
+    baseline = farm_power(wind_farm_model, x, y, cell_wd, cell_ws, yaw.reshape(-1, n_wt), batch_size, type_index, h)
+    best = baseline.reshape(n_wd, n_ws).copy()
+    # orders[l, step] is the turbine at position step (upwind first) for direction l
+    orders = np.array([upwind_order(x, y, direction) for direction in wd])
+    rows = np.arange(n_wd)
+
+    for _ in range(passes):
+        changed = False
+        for step in range(n_wt - 1):
+            turbine = orders[:, step]
+            trial = np.repeat(yaw[:, :, None, :], n_c, axis=2)  # (wd, ws, candidate, wt)
+            trial[rows, :, :, turbine] = candidates
+            power = farm_power(wind_farm_model, x, y, np.repeat(cell_wd, n_c), np.repeat(cell_ws, n_c),
+                               trial.reshape(-1, n_wt), batch_size, type_index, h).reshape(n_wd, n_ws, n_c)
+            choice = power.argmax(axis=2)
+            gain = np.take_along_axis(power, choice[..., None], axis=2)[..., 0]
+            better = gain > best * (1 + rtol)
+            if better.any():
+                changed = True
+                l, k = np.nonzero(better)
+                yaw[l, k, turbine[l]] = candidates[choice[l, k]]
+                best[better] = gain[better]
+        if not changed:
+            break
+    return {'yaw': yaw, 'wd': wd, 'ws': ws, 'x': x, 'y': y,
+            'power_baseline': baseline.reshape(n_wd, n_ws), 'power_optimized': best}
+
+
+def save_yaw_table(path, table):
+    np.savez(path, **table)
+
+
+def load_yaw_table(path):
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def yaw_lookup(table, wd, ws):
+    """Yaw (turbine, wd, ws) in degrees for any wd/ws grid.
+
+    Uses the nearest sector and the nearest wind speed. Wind speeds outside the
+    table's range get 0.
+    """
+    wd = np.atleast_1d(np.asarray(wd, dtype=float))
+    ws = np.atleast_1d(np.asarray(ws, dtype=float))
+    sector_distance = np.abs((wd[:, None] - table['wd'][None, :] + 180) % 360 - 180)
+    l = sector_distance.argmin(axis=1)
+    k = np.abs(ws[:, None] - table['ws'][None, :]).argmin(axis=1)
+    yaw = table['yaw'][l[:, None], k[None, :]]  # (wd, ws, turbine)
+    outside = (ws < table['ws'].min()) | (ws > table['ws'].max())
+    yaw[:, outside] = 0
+    return np.moveaxis(yaw, -1, 0)
+
+
+def aep_with_yaw(wind_farm_model, x, y, table, wd=None, ws=None, type_index=None, h=None):
+    """Simulation result with the table's yaw applied; wd and ws default to the table's grid."""
+    wd = table['wd'] if wd is None else np.atleast_1d(wd)
+    ws = table['ws'] if ws is None else np.atleast_1d(ws)
+    if len(x) != table['yaw'].shape[-1]:
+        raise ValueError(f"Yaw table is for {table['yaw'].shape[-1]} turbines, layout has {len(x)}")
+    type_index = np.zeros(len(x), dtype=int) if type_index is None else type_index
+    return wind_farm_model(x, y, h=h, type=type_index, wd=wd, ws=ws, yaw=yaw_lookup(table, wd, ws), tilt=0)